@@ -1,181 +1,196 @@
 import argparse
+import logging
+import mimetypes
+from urllib.parse import urlencode
 
-import pandas as pd
-from dash import Dash, dash_table, dcc, html, Input, Output
+from dash import Dash, dcc, html, no_update, Input, Output, State, MATCH
+from flask import Response, request, stream_with_context
 
-from utils.dash_styling import create_paragraphs_from_list_of_comments, produce_dash_table_with_common_styling
-from utils.data_preparation import DataPreparation
-from utils.excel_parser import ExcelParser
+from utils.parser_instrumentation import ParserInstrumentation
+from utils.export import ALL_DATASETS, EXPORT_DATASETS, EXPORT_FORMATS, export_filename, report_export_frames, report_export_stem, stream_export
+from utils.report_cache import ReportCache, DEFAULT_CACHE_DIR
+from utils.report_library import ReportLibrary, ReportDirectoryWatcher, load_report
+from utils.report_views import VIEW_OPTIONS, DEFAULT_VIEW, TABLE_ID_TYPE
+
+
+DOWNLOAD_ROUTE = "download"
+NO_REPORTS_HEADING = "No reports loaded"
+NO_REPORTS_MESSAGE = "There are no reports to show yet. Reports added to the reports directory appear here once parsed."
 
 
 def parse_args():
 	parser = argparse.ArgumentParser(description="Launch Dash app to display contents \
 																	of existing BFI weekend box office xls report.")
-	parser.add_argument("xls_file", type=str, help="Path to the XLS file to display. \
+	parser.add_argument("xls_file", type=str, nargs="?", default=None, help="Path to the XLS file to display. \
 										 The XLS file must be in the format of the BFI's existing weekly weekend box office reports.")
-	return parser.parse_args()
+	parser.add_argument("--reports-dir", type=str, default=None, help="Serve every XLS report in this directory instead \
+										 of a single file. The directory is watched, and new or changed reports are parsed in the \
+										 background and swapped in without restarting the server.")
+	parser.add_argument("--poll-seconds", type=float, default=30, help="How often --reports-dir is checked for new reports.")
+	parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the parsed report cache.")
+	parser.add_argument("--no-cache", action="store_true", help="Always parse the XLS file, bypassing the parsed report cache.")
+	parser.add_argument("--parse-metrics", action="store_true", help="Log the wall time, rows scanned and peak memory \
+										 of each parsing step when the XLS file is parsed.")
+	args = parser.parse_args()
+	if (args.xls_file is None) == (args.reports_dir is None):
+		parser.error("Give either the path of an XLS file or --reports-dir.")
+	return args
+
+
+def create_app(report_library: ReportLibrary, refresh_seconds: float = None) -> Dash:
+	"""
+		Builds the dashboard over the reports of the library. With refresh_seconds, the report selector's
+		options are refreshed at that interval, so reports added to the library appear without a page reload.
+	"""
+	app = Dash()
 
+	def report_view(report_views, view_id: str) -> tuple:
+		# the library can be emptied by the watcher, e.g. when every report is removed from the reports directory
+		if report_views is None:
+			return [html.P(NO_REPORTS_MESSAGE)], NO_REPORTS_HEADING
+		return [report_views.view(view_id)], report_views.report.report_heading
+
+	def serve_layout():
+		# evaluated on every page load, so each visitor starts from the library's current reports
+		latest_key = report_library.latest_key()
+		dataset_view, report_heading = report_view(report_library.get(latest_key), DEFAULT_VIEW)
+		return html.Div(children=[
+				html.H1(id="report-heading", children=report_heading),
+
+				html.Div(id="selectors", children=[
+						dcc.Dropdown(
+								id="report-selector",
+								options=report_library.options(),
+								value=latest_key,
+								clearable=False,
+								style={"width": "420px"}
+						),
 
-def main():
-	args = parse_args()
-	excel_report_pathway = args.xls_file
-	excel_parser = ExcelParser(excel_report_pathway)
-	data_preparer = DataPreparation()
-	top15_df = data_preparer.restore_original_formatting(excel_parser.top_15_df_with_notes_column)
-	uk_films_in_top15_df = excel_parser.filter_for_UK_films(top15_df)
-	new_releases_in_top15_df = excel_parser.filter_for_new_releases(top15_df)
-	other_uk_films_df = data_preparer.restore_original_formatting(excel_parser.other_uk_films_df)
-	all_uk_films_df = pd.concat([uk_films_in_top15_df, other_uk_films_df], ignore_index=True)
-	other_new_releases_df = data_preparer.restore_original_formatting(excel_parser.other_new_releases_df)
-	all_new_releases_df = pd.concat([new_releases_in_top15_df, other_new_releases_df], ignore_index=True)
-	openers_next_week_df = excel_parser.openers_next_week_df
-	total_weekend_gross_of_top_15 = data_preparer.format_gbp_currency(excel_parser.total_top_15_weekend_gross)
-	total_gross_to_date_of_top_15 = data_preparer.format_gbp_currency(excel_parser.total_top_15_gross_to_date)
+						dcc.Dropdown(
+								id="div-selector",
+								options=VIEW_OPTIONS,
+								value=DEFAULT_VIEW,
+								clearable=False,
+								style={"width": "320px"}
+						),
+				], style={"display": "flex", "gap": "8px"}
+				),
 
-	app = Dash()
+				html.Div(id="downloads", children=[
+						dcc.Dropdown(id="export-format", options=[{"label": export_format, "value": export_format}
+																											for export_format in EXPORT_FORMATS],
+												 value="csv", clearable=False, style={"width": "120px"}),
+						html.A(html.Button("Download this dataset"), id="download-selected-dataset"),
+						html.A(html.Button("Download all datasets"), id="download-all-datasets"),
+				], style={"display": "flex", "gap": "8px", "marginTop": "10px"}
+				),
 
-	app.layout = html.Div(children=[
-			html.H1(children=excel_parser.report_heading),
-
-			dcc.Dropdown(
-					id="div-selector",
-					options=[
-							{"label": "Top 15 Highest Grossing Films", "value": "top-15"},
-							{"label": "UK Films in the Top 15", "value": "uk-in-top-15"},
-							{"label": "New Releases in the Top 15", "value": "new-releases-in-top-15"},
-							{"label": "All UK Films", "value": "all-uk-films"},
-							{"label": "All New Releases", "value": "all-new-releases"},
-							{"label": "Openers Next Week", "value": "openers-next-week"}
-					],
-					value="top-15",
-					clearable=False
-			),
-
-			html.Div(id="top-15", children=[
-					html.H2("""
-							Top 15 Highest-Grossing Films
-					"""),
-
-					dcc.Markdown("""
-							*Note: 'Weekend Gross' figures will include Previews where applicable. See Notes column for more details.*
-						"""
-						),
+				html.Div(id="dataset-view", children=dataset_view),
+
+				dcc.Interval(id="report-refresh", interval=(refresh_seconds or 0) * 1000,
+										 disabled=refresh_seconds is None)
+		])
+
+	app.layout = serve_layout
+
+	@app.callback(
+			[Output("report-selector", "options"),
+			Output("report-selector", "value")],
+			[Input("report-refresh", "n_intervals")],
+			[State("report-selector", "value")],
+			prevent_initial_call=True
+	)
+	def refresh_report_options(n_intervals, selected_report) -> tuple:
+		options = report_library.options()
+		if any(option["value"] == selected_report for option in options):
+			return options, no_update
+		return options, report_library.latest_key()
+
+	@app.callback(
+			[Output("dataset-view", "children"),
+			Output("report-heading", "children")],
+			[Input("report-selector", "value"),
+			Input("div-selector", "value")]
+	)
+	def display_selected_dataset(selected_report, selected_div) -> tuple:
+		# only the selected view is built and sent; views already built are served from memory
+		return report_view(report_library.get(selected_report), selected_div)
+
+	@app.callback(
+			[Output({"type": TABLE_ID_TYPE, "index": MATCH}, "data"),
+			Output({"type": TABLE_ID_TYPE, "index": MATCH}, "page_count")],
+			[Input({"type": TABLE_ID_TYPE, "index": MATCH}, "page_current"),
+			Input({"type": TABLE_ID_TYPE, "index": MATCH}, "page_size"),
+			Input({"type": TABLE_ID_TYPE, "index": MATCH}, "sort_by"),
+			Input({"type": TABLE_ID_TYPE, "index": MATCH}, "filter_query")],
+			[State({"type": TABLE_ID_TYPE, "index": MATCH}, "id"),
+			State("report-selector", "value")]
+	)
+	def serve_table_page(page_current, page_size, sort_by, filter_query, table_id, selected_report) -> tuple:
+		# paging, sorting and filtering happen here, so only the current page of rows is sent to the browser
+		report_views = report_library.get(selected_report)
+		if report_views is None:
+			return [], 0
+		return report_views.table_page(table_id["index"], page_current, page_size, sort_by, filter_query)
 
-					produce_dash_table_with_common_styling(top15_df),
-
-					html.Div(id="revenue-totals", children=[
-							html.P(f"Top 15 Total Weekend Gross: {total_weekend_gross_of_top_15}", style={"fontWeight": "bold"}),
-							html.P(f"Total 15 Total Gross To Date: {total_gross_to_date_of_top_15}", style={"fontWeight": "bold"})
-					], style={"marginTop": "20px"}
-					),
-
-					html.Div(id="comments", children=[
-							html.H3("""
-									Comments on this week's top 15 results
-							"""),
-
-							html.Div(create_paragraphs_from_list_of_comments(excel_parser.list_of_comments_on_top_15_result)),
-					]),
-
-			], style={"display": "block"}),
-
-			html.Div(id="uk-in-top-15", children=[
-					html.H2("""
-							UK Films in the Top 15
-					"""),
-					produce_dash_table_with_common_styling(uk_films_in_top15_df)
-			], style={"display": "none"}
-			),
-
-			html.Div(id="new-releases-in-top-15", children=[
-					html.H2("""
-							New Releases in the Top 15
-					"""),
-					produce_dash_table_with_common_styling(new_releases_in_top15_df)
-			], style={"display": "none"}
-			),
-
-			html.Div(id="all-uk-films", children=[
-					html.H2("""
-							All UK Films
-					"""),
-					produce_dash_table_with_common_styling(all_uk_films_df)
-			], style={"display": "none"}
-			),
-
-			html.Div(id="all-new-releases", children=[
-					html.H2("""
-							All New Releases
-					"""),
-					produce_dash_table_with_common_styling(all_new_releases_df)
-			], style={"display": "none"}
-			),
-
-			html.Div(id="openers-next-week", children=[
-					html.H2("""
-							Openers Next Week
-					"""),
-					dash_table.DataTable(data=openers_next_week_df.to_dict('records'),
-															style_table={
-																"width": "auto",
-																"minWidth": "50%",
-																"maxWidth": "75%",
-															},
-															style_header={
-																"whitespace": "nowrap",
-																"textAlign": "left"
-															},
-															style_cell={
-															"minWidth": "50px",
-															"width": "auto",
-															"maxWidth": "200px",
-															"whiteSpace": "normal",
-															"paddingLeft": "8px",
-															"paddingRight": "8px"
-															},
-															style_data={
-																"textAlign": "left"
-															},
-															fixed_rows={"headers": True},)
-			], style={"width": "100%", "display": "none"}
-			)
-	])
+	def download_url(selected_report: str, dataset_selection: str, export_format: str) -> str:
+		query = urlencode({"report": selected_report, "dataset": dataset_selection, "format": export_format})
+		return f"{app.get_relative_path('/' + DOWNLOAD_ROUTE)}?{query}"
 
 	@app.callback(
-			[Output("top-15", "style"),
-			Output("uk-in-top-15", "style"),
-			Output("new-releases-in-top-15", "style"),
-			Output("all-uk-films", "style"),
-			Output("all-new-releases", "style"),
-			Output("openers-next-week", "style")],
-			[Input("div-selector", "value")]
+			[Output("download-selected-dataset", "href"),
+			Output("download-all-datasets", "href")],
+			[Input("report-selector", "value"),
+			Input("div-selector", "value"),
+			Input("export-format", "value")]
 	)
-	def toggle_dataset_visibility(selected_div) -> tuple:
-		top15_style = {"display": "none"}
-		ukintop15_style = {"display": "none"}
-		newreleasesintop15_style = {"display": "none"}
-		allukfilms_style = {"display": "none"}
-		allnewreleases_style = {"display": "none"}
-		openersnextweek_style = {"display": "none"}
-
-		if selected_div == "top-15":
-				top15_style = {"display": "block"}
-		elif selected_div == "uk-in-top-15":
-				ukintop15_style = {"display": "block"}
-		elif selected_div == "new-releases-in-top-15":
-				newreleasesintop15_style = {"display": "block"}
-		elif selected_div == "all-uk-films":
-				allukfilms_style = {"display": "block"}
-		elif selected_div == "all-new-releases":
-				allnewreleases_style = {"display": "block"}
-		elif selected_div == "openers-next-week":
-				openersnextweek_style = {"display": "block"}
-
-		return top15_style, ukintop15_style, newreleasesintop15_style, allukfilms_style, \
-							allnewreleases_style, openersnextweek_style
-
-	app.run_server(debug=True)
+	def update_download_links(selected_report, selected_div, export_format) -> tuple:
+		return (download_url(selected_report, selected_div, export_format),
+						download_url(selected_report, ALL_DATASETS, export_format))
+
+	@app.server.route(f"{app.config.routes_pathname_prefix}{DOWNLOAD_ROUTE}")
+	def download_datasets() -> Response:
+		# the file is sent a chunk at a time as it is written, rather than built in memory and sent through a callback
+		# looked up strictly, so a link to a weekend that is not served is a 404 rather than another weekend's data
+		report_views = report_library.get(request.args.get("report"), fallback_to_latest=False)
+		dataset_selection = request.args.get("dataset", ALL_DATASETS)
+		export_format = request.args.get("format", "csv")
+		if report_views is None or export_format not in EXPORT_FORMATS or \
+				dataset_selection not in EXPORT_DATASETS + [ALL_DATASETS]:
+			# returned rather than raised, as Dash's debug mode reports every raised HTTP error as a 500
+			return Response("No such report, dataset or export format.", status=404, mimetype="text/plain")
+		filename = export_filename(report_export_stem(report_views.report.report_heading), dataset_selection, export_format)
+		chunks = stream_export(report_export_frames(report_views, dataset_selection), export_format)
+		return Response(stream_with_context(chunks),
+										mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+										headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+	return app
+
+
+def main():
+	args = parse_args()
+	instrumentation = None
+	if args.parse_metrics:
+		logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+		instrumentation = ParserInstrumentation()
+	cache = None if args.no_cache else ReportCache(args.cache_dir)
+	report_library = ReportLibrary()
+
+	if args.reports_dir is None:
+		report_library.add(args.xls_file, load_report(args.xls_file, cache, instrumentation))
+		create_app(report_library).run_server(debug=True)
+	else:
+		logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+		watcher = ReportDirectoryWatcher(report_library, args.reports_dir, cache, args.poll_seconds,
+																		 instrumentation)
+		watcher.scan_once() # every report already in the directory is parsed before the server starts
+		if report_library.latest_key() is None:
+			raise SystemExit(f"No loadable XLS reports found in {args.reports_dir}.")
+		watcher.start()
+		# the reloader would run a second watcher in its parent process
+		create_app(report_library, refresh_seconds=args.poll_seconds).run_server(debug=True, use_reloader=False)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
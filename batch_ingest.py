@@ -0,0 +1,68 @@
+import argparse
+import os
+
+from utils.batch_ingestion import ingest_reports, resolve_report_paths
+from utils.film_run_store import FilmRunStore
+from utils.report_analytics import ReportAnalytics
+from utils.report_database import ReportDatabase
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Parse a batch of BFI weekend box office xls reports in parallel \
+																	and consolidate their datasets.")
+	parser.add_argument("sources", type=str, nargs="+", help="Directories, glob patterns (e.g. 'test-reports/*.xls') \
+										 or paths of the XLS files to parse.")
+	parser.add_argument("--workers", type=int, default=None, help="Number of worker processes. \
+										 Defaults to the number of CPUs.")
+	parser.add_argument("--output-dir", type=str, default=None, help="If given, each consolidated dataset is \
+										 written to this directory as a csv file.")
+	parser.add_argument("--parse-metrics", action="store_true", help="Record the wall time, rows scanned and peak \
+										 memory of each parsing step, and print them totalled by step.")
+	parser.add_argument("--store", type=str, default=None, help="Path of a film run store to append the parsed \
+										 reports to. Created if it does not exist; weekends already in the store are skipped.")
+	parser.add_argument("--analytics", type=str, default=None, help="Path of a cross-week analytics file to add \
+										 the parsed reports' aggregates to. Created if it does not exist; weekends already in it are skipped.")
+	parser.add_argument("--database", type=str, default=None, help="Path of a SQLite report database to write the \
+										 parsed reports to. Created if it does not exist; weekends already in it are skipped.")
+	return parser.parse_args()
+
+
+def main():
+	args = parse_args()
+	report_paths = resolve_report_paths(args.sources)
+	if not report_paths:
+		raise SystemExit("No xls reports found for the given sources.")
+
+	result = ingest_reports(report_paths, max_workers=args.workers, collect_parse_metrics=args.parse_metrics)
+	print(result.summary())
+	if args.parse_metrics:
+		print(result.parse_metrics_by_step().to_string())
+
+	if args.output_dir is not None:
+		os.makedirs(args.output_dir, exist_ok=True)
+		for dataset_name, df in result.datasets.items():
+			df.to_csv(os.path.join(args.output_dir, f"{dataset_name}.csv"), index=False)
+		if args.parse_metrics:
+			result.parse_metrics.to_csv(os.path.join(args.output_dir, "parse_metrics.csv"), index=False)
+		print(f"Consolidated datasets written to {args.output_dir}")
+
+	if args.store is not None:
+		store = FilmRunStore.load(args.store) if os.path.exists(args.store) else FilmRunStore()
+		appended = store.extend_from_consolidated(result.datasets)
+		store.save(args.store)
+		print(f"Appended {len(appended)} reports to {args.store} ({len(store.weekends)} weekends, {len(store)} rows)")
+
+	if args.analytics is not None:
+		analytics = ReportAnalytics.load(args.analytics) if os.path.exists(args.analytics) else ReportAnalytics()
+		ingested = analytics.extend_from_consolidated(result.datasets)
+		analytics.save(args.analytics)
+		print(f"Added the aggregates of {len(ingested)} reports to {args.analytics} ({len(analytics.weekends)} weekends)")
+
+	if args.database is not None:
+		database = ReportDatabase(args.database)
+		written = database.extend_from_consolidated(result.datasets, result.report_details)
+		print(f"Wrote {len(written)} reports to {args.database} ({len(database.weekends())} weekends)")
+
+
+if __name__ == "__main__":
+	main()
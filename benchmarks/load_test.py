@@ -0,0 +1,330 @@
+import argparse
+import contextlib
+import glob
+import importlib.util
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import signal
+import socket
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from benchmarks.synthetic_reports import build_synthetic_sheet, parse_synthetic_sheet
+from utils.report_cache import ParsedReport
+from utils.report_library import ReportLibrary, load_report
+from utils.report_views import VIEW_OPTIONS, TABLE_ID_TYPE
+
+
+# gunicorn is not part of the base environment; without it, production mode pre-forks Werkzeug servers
+GUNICORN_AVAILABLE = importlib.util.find_spec("gunicorn") is not None
+SERVER_MODES = ("debug", "production")
+# Endpoint -> what each request to it does
+ENDPOINTS = {
+	"layout": "GET /_dash-layout, as on every page load",
+	"select-view": "POST /_dash-update-component for display_selected_dataset, as on selecting a report or view",
+	"table-page": "POST /_dash-update-component for serve_table_page, as on paging, sorting or filtering a table",
+}
+VIEW_IDS = [option["value"] for option in VIEW_OPTIONS]
+DEFAULT_CONCURRENCY = [1, 8, 32]
+PERCENTILES = (50, 90, 99)
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Load test the dashboard's layout and callback endpoints \
+																	with concurrent clients, over the sample reports or synthetic reports scaled up from them.")
+	parser.add_argument("--reports", type=str, default="test-reports/*.xls", help="Glob of the reports to serve.")
+	parser.add_argument("--scale", type=int, default=1, help="Row multiplier of the synthetic reports built from each \
+										 report. 1 serves the reports as they are.")
+	parser.add_argument("--server", type=str, default="debug", choices=SERVER_MODES, help="'debug' runs the Dash \
+										 development server in debug mode, as app.py does; 'production' runs without debug on \
+										 multiple worker processes (gunicorn if installed, otherwise pre-forked threaded Werkzeug servers).")
+	parser.add_argument("--workers", type=int, default=4, help="Number of worker processes in production mode.")
+	parser.add_argument("--port", type=int, default=8051, help="Port to start the app on.")
+	parser.add_argument("--url", type=str, default=None, help="Load test an app already running at this URL \
+										 (e.g. http://127.0.0.1:8050) instead of starting one.")
+	parser.add_argument("--endpoints", type=str, nargs="*", default=list(ENDPOINTS), choices=list(ENDPOINTS),
+										 help="Endpoints to send requests to, in turn: " + "; ".join(f"{endpoint}: {description}"
+																																	for endpoint, description in ENDPOINTS.items()))
+	parser.add_argument("--concurrency", type=int, nargs="*", default=DEFAULT_CONCURRENCY, help="Numbers of concurrent \
+										 clients to run the load test at, one level after another.")
+	parser.add_argument("--requests", type=int, default=200, help="Number of requests sent at each concurrency level.")
+	parser.add_argument("--page-size", type=int, default=25, help="Page size of the table-page requests.")
+	parser.add_argument("--startup-timeout", type=float, default=120, help="Seconds to wait for the started app to respond.")
+	parser.add_argument("--output", type=str, default=None, help="Path of a json results file.")
+	return parser.parse_args()
+
+
+def build_report_library(report_paths: list[str], scale: int = 1) -> ReportLibrary:
+	report_library = ReportLibrary()
+	with contextlib.redirect_stdout(io.StringIO()):
+		for excel_report_filepath in report_paths:
+			if scale == 1:
+				report = load_report(excel_report_filepath)
+			else:
+				report = ParsedReport.from_excel_parser(parse_synthetic_sheet(build_synthetic_sheet(excel_report_filepath, scale)))
+			report_library.add(excel_report_filepath, report)
+	return report_library
+
+
+def _run_gunicorn(wsgi_app, port: int, workers: int) -> None:
+	from gunicorn.app.base import BaseApplication
+
+	class DashboardApplication(BaseApplication):
+		# the app is built before the workers are forked, so they share the parsed reports
+		def load_config(self):
+			self.cfg.set("bind", f"127.0.0.1:{port}")
+			self.cfg.set("workers", workers)
+
+		def load(self):
+			return wsgi_app
+
+	DashboardApplication().run()
+
+
+def _run_prefork(wsgi_app, port: int, workers: int) -> None:
+	"""
+		Serves the app from a pool of forked worker processes that accept connections from one shared
+		listening socket, each running a threaded Werkzeug server, much as gunicorn's sync workers do.
+	"""
+	from werkzeug.serving import make_server
+
+	listener = socket.create_server(("127.0.0.1", port))
+	worker_pids = []
+	for _ in range(workers):
+		pid = os.fork()
+		if pid == 0:
+			make_server("127.0.0.1", port, wsgi_app, threaded=True, fd=listener.fileno()).serve_forever()
+			os._exit(0)
+		worker_pids.append(pid)
+
+	def stop_workers(signum, frame):
+		for worker_pid in worker_pids:
+			os.kill(worker_pid, signal.SIGTERM)
+		raise SystemExit(0)
+
+	signal.signal(signal.SIGTERM, stop_workers)
+	for worker_pid in worker_pids:
+		os.waitpid(worker_pid, 0)
+
+
+def serve(report_paths: list[str], scale: int, server_mode: str, port: int, workers: int) -> None:
+	"""
+		Builds the dashboard over the reports and serves it until the process is terminated.
+	"""
+	from app import create_app
+
+	report_library = build_report_library(report_paths, scale)
+	# every view is built up front: forked workers would otherwise each build, and then drop, their own copies
+	for report_key in report_library.keys():
+		report_views = report_library.get(report_key)
+		for view_id in VIEW_IDS:
+			report_views.view(view_id)
+	logging.getLogger("werkzeug").setLevel(logging.WARNING) # a log line per request would skew the latencies
+	dash_app = create_app(report_library)
+	if server_mode == "debug":
+		dash_app.run_server(debug=True, use_reloader=False, port=port)
+	elif GUNICORN_AVAILABLE:
+		_run_gunicorn(dash_app.server, port, workers)
+	else:
+		_run_prefork(dash_app.server, port, workers)
+
+
+def _wait_until_ready(base_url: str, timeout: float, server_process: multiprocessing.Process) -> None:
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		if not server_process.is_alive():
+			raise SystemExit("The app exited before it started serving.")
+		try:
+			with urllib.request.urlopen(f"{base_url}/_dash-layout", timeout=5):
+				return
+		except (urllib.error.URLError, ConnectionError, TimeoutError):
+			time.sleep(0.5)
+	raise SystemExit(f"The app did not respond within {timeout:.0f}s.")
+
+
+def _find_component(layout, component_id: str) -> dict | None:
+	if isinstance(layout, list):
+		for child in layout:
+			found = _find_component(child, component_id)
+			if found is not None:
+				return found
+	elif isinstance(layout, dict):
+		props = layout.get("props", {})
+		if props.get("id") == component_id:
+			return layout
+		return _find_component(props.get("children"), component_id)
+	return None
+
+
+class DashboardClient:
+	"""
+		Sends the requests a browser sends to the dashboard, with the callback output keys and report
+		keys read from the running app's dependencies and layout.
+	"""
+	def __init__(self, base_url: str, page_size: int = 25):
+		self.base_url = base_url.rstrip("/")
+		self.page_size = page_size
+		dependencies = json.loads(self._request("GET", "/_dash-dependencies")[1])
+		self.callback_outputs = {
+			"select-view": next(dependency["output"] for dependency in dependencies
+													if "dataset-view.children" in dependency["output"]),
+			"table-page": next(dependency["output"] for dependency in dependencies
+												 if f'"type":"{TABLE_ID_TYPE}"' in dependency["output"]),
+		}
+		report_selector = _find_component(json.loads(self._request("GET", "/_dash-layout")[1]), "report-selector")
+		self.report_keys = [option["value"] for option in report_selector["props"]["options"]]
+
+	def _request(self, method: str, path: str, body: dict = None) -> tuple[int, bytes]:
+		data = json.dumps(body).encode() if body is not None else None
+		request = urllib.request.Request(self.base_url + path, data=data, method=method,
+																		 headers={"Content-Type": "application/json"} if data else {})
+		try:
+			with urllib.request.urlopen(request, timeout=60) as response:
+				return response.status, response.read()
+		except urllib.error.HTTPError as error:
+			return error.code, error.read()
+
+	def _select_view_body(self, report_key: str, view_id: str) -> dict:
+		return {
+			"output": self.callback_outputs["select-view"],
+			"outputs": [{"id": "dataset-view", "property": "children"}, {"id": "report-heading", "property": "children"}],
+			"inputs": [{"id": "report-selector", "property": "value", "value": report_key},
+								 {"id": "div-selector", "property": "value", "value": view_id}],
+			"changedPropIds": ["div-selector.value"],
+		}
+
+	def _table_page_body(self, report_key: str, view_id: str, page_current: int) -> dict:
+		table_id = {"index": view_id, "type": TABLE_ID_TYPE}
+		return {
+			"output": self.callback_outputs["table-page"],
+			"outputs": [{"id": table_id, "property": "data"}, {"id": table_id, "property": "page_count"}],
+			"inputs": [{"id": table_id, "property": "page_current", "value": page_current},
+								 {"id": table_id, "property": "page_size", "value": self.page_size},
+								 {"id": table_id, "property": "sort_by", "value": []},
+								 {"id": table_id, "property": "filter_query", "value": ""}],
+			"state": [{"id": table_id, "property": "id", "value": table_id},
+								{"id": "report-selector", "property": "value", "value": report_key}],
+			"changedPropIds": [f"{json.dumps(table_id, separators=(',', ':'))}.page_current"],
+		}
+
+	def send(self, endpoint: str, request_index: int) -> dict:
+		"""
+			Sends the request_index-th request of a run to the endpoint, cycling through the reports,
+			views and first pages, and returns its latency, status and response size.
+		"""
+		report_key = self.report_keys[request_index % len(self.report_keys)]
+		view_id = VIEW_IDS[request_index % len(VIEW_IDS)]
+		start = time.perf_counter()
+		if endpoint == "layout":
+			status, content = self._request("GET", "/_dash-layout")
+		elif endpoint == "select-view":
+			status, content = self._request("POST", "/_dash-update-component", self._select_view_body(report_key, view_id))
+		else:
+			page_current = request_index % 3 # a page may be past the end of a short table, which returns no rows
+			status, content = self._request("POST", "/_dash-update-component",
+																			self._table_page_body(report_key, view_id, page_current))
+		return {"endpoint": endpoint, "seconds": time.perf_counter() - start, "status": status, "bytes": len(content)}
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+	# nearest-rank percentile
+	rank = max(int(-(-percentile * len(sorted_values) // 100)), 1)
+	return sorted_values[rank - 1]
+
+
+def _summarise(samples: list[dict], concurrency: int, wall_seconds: float) -> list[dict]:
+	groups = {endpoint: [sample for sample in samples if sample["endpoint"] == endpoint]
+						for endpoint in dict.fromkeys(sample["endpoint"] for sample in samples)}
+	groups["all"] = samples
+	results = []
+	for endpoint, endpoint_samples in groups.items():
+		latencies = sorted(sample["seconds"] for sample in endpoint_samples)
+		sizes = [sample["bytes"] for sample in endpoint_samples]
+		result = {
+			"concurrency": concurrency,
+			"endpoint": endpoint,
+			"requests": len(endpoint_samples),
+			"errors": sum(sample["status"] != 200 for sample in endpoint_samples),
+			"requests_per_second": len(endpoint_samples) / wall_seconds,
+		}
+		for percentile in PERCENTILES:
+			result[f"p{percentile}_ms"] = _percentile(latencies, percentile) * 1000
+		result["max_ms"] = latencies[-1] * 1000
+		result["mean_kib"] = sum(sizes) / len(sizes) / 1024
+		result["max_kib"] = max(sizes) / 1024
+		results.append(result)
+	return results
+
+
+def run_load_test(client: DashboardClient, endpoints: list[str], concurrency_levels: list[int], num_requests: int) -> list[dict]:
+	"""
+		Sends num_requests requests at each concurrency level, keeping that many in flight at once,
+		and returns the latency percentiles, throughput and response sizes per endpoint and overall.
+	"""
+	# each endpoint is requested once first, so the views are built before timing starts
+	for request_index, endpoint in enumerate(endpoints * len(VIEW_IDS)):
+		client.send(endpoint, request_index)
+
+	results = []
+	for concurrency in concurrency_levels:
+		start = time.perf_counter()
+		with ThreadPoolExecutor(max_workers=concurrency) as executor:
+			samples = list(executor.map(lambda request_index: client.send(endpoints[request_index % len(endpoints)],
+																																		 request_index // len(endpoints)),
+																	range(num_requests)))
+		results += _summarise(samples, concurrency, time.perf_counter() - start)
+	return results
+
+
+def main():
+	args = parse_args()
+	server_process = None
+	base_url = args.url
+	if base_url is None:
+		report_paths = sorted(glob.glob(args.reports))
+		if not report_paths:
+			raise SystemExit(f"No reports match '{args.reports}'.")
+		server_process = multiprocessing.Process(target=serve, args=(report_paths, args.scale, args.server, args.port,
+																																 args.workers), daemon=True)
+		server_process.start()
+		base_url = f"http://127.0.0.1:{args.port}"
+
+	try:
+		if server_process is not None:
+			_wait_until_ready(base_url, args.startup_timeout, server_process)
+		results = run_load_test(DashboardClient(base_url, args.page_size), args.endpoints, args.concurrency, args.requests)
+	finally:
+		if server_process is not None:
+			server_process.terminate()
+			server_process.join()
+
+	print(pd.DataFrame(results).to_string(index=False, float_format=lambda value: f"{value:.1f}"))
+	if args.output is not None:
+		with open(args.output, "w") as f:
+			json.dump({
+				"metadata": {
+					"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+					"python": platform.python_version(),
+					"platform": platform.platform(),
+					"url": args.url,
+					"reports": None if args.url else args.reports,
+					"scale": None if args.url else args.scale,
+					"server": None if args.url else args.server,
+					"workers": args.workers if args.url is None and args.server == "production" else None,
+					"wsgi_server": None if args.url or args.server == "debug" else ("gunicorn" if GUNICORN_AVAILABLE else "werkzeug"),
+				},
+				"results": results,
+			}, f, indent=2)
+		print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,205 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_reports import build_synthetic_sheet
+from utils.excel_parser import ExcelParser
+from utils.parser_instrumentation import ParserInstrumentation
+from utils.report_views import ReportViews, VIEW_OPTIONS
+from utils.sheet_scanner import SheetScanner
+
+
+# ExcelParser step -> phase it is reported under
+PARSER_STEP_PHASES = {
+	"_open_workbook": "workbook open",
+	"_get_excel_sheet": "workbook open",
+	"_scan_sheet": "sheet scan",
+	"_learn_layout_fingerprint": "sheet scan",
+	"_scan_sheet with fingerprint": "sheet scan",
+	"_get_report_heading": "top 15 table read",
+	"_get_column_names": "top 15 table read",
+	"_read_top_15_table_to_df": "top 15 table read",
+	"_get_top_15_weekend_gross": "top 15 table read",
+	"_get_top_15_total_gross_to_date": "top 15 table read",
+	"_check_for_change_in_footnotes_below_top_15_table": "boundary detection",
+	"_find_end_of_other_uk_films_table": "boundary detection",
+	"_find_end_of_other_new_releases_table": "boundary detection",
+	"_find_start_boundary_of_comments_on_top_15": "boundary detection",
+	"_find_start_boundary_of_notes_for_top_15_section": "boundary detection",
+	"_find_start_of_openers_next_week_table": "boundary detection",
+	"_read_other_uk_films_table_to_df": "other UK films table read",
+	"_read_other_new_releases_table_to_df": "other new releases table read",
+	"_read_comments_on_top_15_to_list": "comments read",
+	"_read_notes_for_top_15_table_to_df": "notes parsing",
+	"_supplement_top_15_df_with_notes_column": "notes merge",
+	"_read_openers_next_week_table_to_df": "openers table read",
+	"_apply_typed_schema": "typing",
+}
+DEFAULT_SCALES = [10, 100, 1000]
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Time ExcelParser phases, data preparation and view building over \
+																	the sample reports and synthetic reports scaled up from them.")
+	parser.add_argument("--reports", type=str, default="test-reports/*.xls", help="Glob of the sample reports to benchmark.")
+	parser.add_argument("--scales", type=int, nargs="*", default=DEFAULT_SCALES, help="Row multipliers of the \
+										 synthetic reports built from the first sample report.")
+	parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs of each benchmark.")
+	parser.add_argument("--output", type=str, default=None, help="Path of the json results file. Printed if not given.")
+	parser.add_argument("--baseline", type=str, default=None, help="Results file of a previous run to compare against.")
+	parser.add_argument("--threshold", type=float, default=1.25, help="Ratio of the fastest run's time over the \
+										 baseline's above which a benchmark counts as a regression.")
+	parser.add_argument("--min-ms", type=float, default=1.0, help="Benchmarks faster than this in the baseline \
+										 are not compared, as their timings are mostly noise.")
+	parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Slowdowns smaller than this are not \
+										 counted as regressions, whatever their ratio.")
+	return parser.parse_args()
+
+
+def _time_parser_steps(excel_report_filepath: str = None, sheet=None, layout_fingerprint=None) -> dict:
+	"""
+		Parses the report with ExcelParser's instrumentation, timing each step.
+		With a synthetic sheet the workbook steps are skipped and the sheet is used directly.
+	"""
+	instrumentation = ParserInstrumentation(log_level=logging.DEBUG, track_memory=False)
+	with contextlib.redirect_stdout(io.StringIO()):
+		if sheet is not None:
+			excel_parser = ExcelParser.from_sheet(sheet, excel_report_filepath, instrumentation, layout_fingerprint)
+		else:
+			excel_parser = ExcelParser(excel_report_filepath, instrumentation, layout_fingerprint)
+	step_timings = {record["step"]: record["wall_seconds"] for record in instrumentation.records}
+	# the same sheet scanned again with the fingerprint just learned, as for the next report of a backfill
+	start = time.perf_counter()
+	SheetScanner(excel_parser.excel_sheet, fingerprint=excel_parser.layout_fingerprint)
+	step_timings["_scan_sheet with fingerprint"] = time.perf_counter() - start
+	return {"timings": step_timings, "parser": excel_parser}
+
+
+def _time_view_preparation(report) -> dict:
+	"""
+		Times the subset/concat step and the formatting step behind each view, from a cold ReportViews.
+	"""
+	report_views = ReportViews(report)
+	timings = {}
+	for option in VIEW_OPTIONS:
+		view_id = option["value"]
+		start = time.perf_counter()
+		report_views.raw_dataset(view_id)
+		timings[f"subset {view_id}"] = time.perf_counter() - start
+		start = time.perf_counter()
+		report_views.dataset(view_id)
+		timings[f"restore_original_formatting {view_id}"] = time.perf_counter() - start
+	start = time.perf_counter()
+	for option in VIEW_OPTIONS:
+		report_views.view(option["value"])
+	timings["build all views"] = time.perf_counter() - start
+	return timings
+
+
+def _summarise(benchmark: str, source: str, scale: int, rows: int, runs: list[dict]) -> list[dict]:
+	results = []
+	for name in runs[0]:
+		samples = [run[name] for run in runs]
+		results.append({
+			"benchmark": benchmark,
+			"source": source,
+			"scale": scale,
+			"rows": rows,
+			"name": name,
+			"phase": PARSER_STEP_PHASES.get(name, "preparation"),
+			"min_seconds": min(samples),
+			"median_seconds": statistics.median(samples),
+			"repeat": len(samples),
+		})
+	return results
+
+
+def _benchmark_source(source: str, scale: int, repeat: int, excel_report_filepath: str = None, sheet=None) -> list[dict]:
+	parser_runs = []
+	preparation_runs = []
+	for _ in range(repeat):
+		run = _time_parser_steps(excel_report_filepath, sheet)
+		parser_runs.append(run["timings"])
+		preparation_runs.append(_time_view_preparation(run["parser"]))
+	rows = run["parser"].excel_sheet.nrows
+	return _summarise("parser", source, scale, rows, parser_runs) + \
+		_summarise("preparation", source, scale, rows, preparation_runs)
+
+
+def run_benchmarks(report_paths: list[str], scales: list[int], repeat: int) -> dict:
+	results = []
+	for excel_report_filepath in report_paths:
+		results += _benchmark_source(os.path.basename(excel_report_filepath), 1, repeat,
+																 excel_report_filepath=excel_report_filepath)
+	for scale in scales:
+		sheet = build_synthetic_sheet(report_paths[0], scale)
+		results += _benchmark_source(f"synthetic x{scale}", scale, repeat, sheet=sheet)
+	return {
+		"metadata": {
+			"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+			"python": platform.python_version(),
+			"pandas": pd.__version__,
+			"platform": platform.platform(),
+		},
+		"results": results,
+	}
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float, min_seconds: float = 0.001,
+													min_delta_seconds: float = 0.001) -> list[str]:
+	"""
+		Compares the fastest run of each benchmark, which is the least affected by noise, with the baseline's.
+		Benchmarks faster than min_seconds in the baseline are skipped, and a slowdown only counts as a regression
+		if it is over the threshold ratio and also over min_delta_seconds, since microsecond steps vary by more
+		than any sensible threshold from one run to the next.
+	"""
+	baseline_mins = {(result["benchmark"], result["source"], result["name"]): result["min_seconds"]
+									 for result in baseline["results"]}
+	regressions = []
+	for result in results["results"]:
+		baseline_min = baseline_mins.get((result["benchmark"], result["source"], result["name"]))
+		if baseline_min is None or baseline_min < min_seconds:
+			continue
+		ratio = result["min_seconds"] / baseline_min
+		if ratio > threshold and result["min_seconds"] - baseline_min > min_delta_seconds:
+			regressions.append(f"{result['source']} / {result['name']}: {baseline_min * 1000:.3f}ms -> \
+{result['min_seconds'] * 1000:.3f}ms ({ratio:.2f}x)")
+	return regressions
+
+
+def main():
+	args = parse_args()
+	report_paths = sorted(glob.glob(args.reports))
+	if not report_paths:
+		raise SystemExit(f"No reports match '{args.reports}'.")
+
+	results = run_benchmarks(report_paths, args.scales, args.repeat)
+	if args.output is not None:
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent=2)
+		print(f"Results written to {args.output}")
+	else:
+		print(json.dumps(results, indent=2))
+
+	if args.baseline is not None:
+		with open(args.baseline) as f:
+			regressions = compare_with_baseline(results, json.load(f), args.threshold, args.min_ms / 1000,
+																						args.min_delta_ms / 1000)
+		for regression in regressions:
+			print(f"REGRESSION {regression}")
+		if regressions:
+			sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,71 @@
+import contextlib
+import io
+
+import xlrd
+
+from utils.excel_parser import ExcelParser
+from utils.sheet_scanner import (SheetScanner, DATA, COMMENT, NOTE, OPENERS, OTHER_UK_FILMS_TABLE,
+                                 OTHER_NEW_RELEASES_TABLE, COMMENTS_SECTION, NOTES_SECTION, OPENERS_SECTION)
+
+
+# (section, row kind) of the template rows that are repeated to scale a report up
+SCALED_ROWS = {
+    (OTHER_UK_FILMS_TABLE, DATA),
+    (OTHER_NEW_RELEASES_TABLE, DATA),
+    (COMMENTS_SECTION, COMMENT),
+    (NOTES_SECTION, NOTE),
+    (OPENERS_SECTION, OPENERS),
+}
+
+
+class SyntheticSheet:
+    """
+        In-memory stand-in for the parts of an xlrd sheet that ExcelParser reads.
+    """
+    def __init__(self, rows: list[list]):
+        self._rows = rows
+        self.nrows = len(rows)
+        self.ncols = max(len(row) for row in rows)
+
+    def row_values(self, row_index: int) -> list:
+        return list(self._rows[row_index])
+
+    def cell_value(self, row_index: int, col_index: int):
+        return self._rows[row_index][col_index]
+
+
+def _renamed_row(row: list, section: str, copy_index: int) -> list:
+    row = list(row)
+    if copy_index == 0:
+        return row
+    if section == NOTES_SECTION:
+        # keeps the "Film (Distributor) - note" layout, as a note on a film outside the top 15
+        film_and_distributor, _, note = row[1].partition(" - ")
+        row[1] = f"{film_and_distributor.replace(' (', f' #{copy_index} (', 1)} - {note}"
+    elif section != COMMENTS_SECTION:
+        row[1] = f"{row[1]} #{copy_index}"
+    return row
+
+
+def build_synthetic_sheet(template_excel_report_filepath: str, scale: int) -> SyntheticSheet:
+    """
+        Builds a report with the same layout as the template, with every row of the other UK films,
+        other new releases, comments, notes and openers sections repeated `scale` times.
+        The top 15 table keeps its 15 rows, since the layout fixes them.
+    """
+    template_sheet = xlrd.open_workbook(template_excel_report_filepath).sheet_by_index(0)
+    sheet_scanner = SheetScanner(template_sheet)
+    rows = []
+    for row_index in range(template_sheet.nrows):
+        row = template_sheet.row_values(row_index)
+        section = sheet_scanner.row_sections[row_index]
+        if (section, sheet_scanner.row_kinds[row_index]) in SCALED_ROWS:
+            rows.extend(_renamed_row(row, section, copy_index) for copy_index in range(scale))
+        else:
+            rows.append(row)
+    return SyntheticSheet(rows)
+
+
+def parse_synthetic_sheet(sheet: SyntheticSheet) -> ExcelParser:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return ExcelParser.from_sheet(sheet)
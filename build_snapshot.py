@@ -0,0 +1,34 @@
+import argparse
+
+from utils.batch_ingestion import resolve_report_paths
+from utils.report_cache import ReportCache, DEFAULT_CACHE_DIR
+from utils.static_snapshot import StaticSnapshotBuilder
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Build a static snapshot of the dashboard for BFI weekend box office \
+																	reports: each weekend's views as html, with their table data as json.")
+	parser.add_argument("sources", type=str, nargs="+", help="Directories, glob patterns (e.g. 'test-reports/*.xls') \
+										 or paths of the XLS files to build.")
+	parser.add_argument("--output-dir", type=str, required=True, help="Directory to build the snapshot in. \
+										 Rebuilding into the same directory only renders the weekends whose source file changed.")
+	parser.add_argument("--force", action="store_true", help="Render every weekend again, even if its source is unchanged.")
+	parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the parsed report cache.")
+	parser.add_argument("--no-cache", action="store_true", help="Always parse the XLS files, bypassing the parsed report cache.")
+	return parser.parse_args()
+
+
+def main():
+	args = parse_args()
+	report_paths = resolve_report_paths(args.sources)
+	if not report_paths:
+		raise SystemExit("No xls reports found for the given sources.")
+
+	cache = None if args.no_cache else ReportCache(args.cache_dir)
+	result = StaticSnapshotBuilder(args.output_dir, cache).build(report_paths, force=args.force)
+	print(result.summary())
+	print(f"Snapshot written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,64 @@
+import argparse
+
+import pandas as pd
+
+from utils.export import (ALL_DATASETS, DEFAULT_CHUNK_SIZE, EXPORT_DATASETS, EXPORT_FORMATS, archive_export_frames,
+                          database_export_frames, export_filename, report_export_frames, report_export_stem, stream_export, write_export)
+from utils.film_run_store import FilmRunStore
+from utils.report_database import ReportDatabase
+from utils.report_cache import ReportCache, DEFAULT_CACHE_DIR
+from utils.report_views import ReportViews
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Export datasets of a BFI weekend box office report, or of a date range \
+																	of weekends from a film run store or report database, as csv, xlsx or parquet.")
+	source = parser.add_mutually_exclusive_group(required=True)
+	source.add_argument("--report", type=str, help="Path to the XLS report to export datasets from.")
+	source.add_argument("--store", type=str, help="Path to a film run store (see batch_ingest.py --store) to export \
+										 a date range of weekends from.")
+	source.add_argument("--database", type=str, help="Path to a report database (see batch_ingest.py --database) \
+										 to export a date range of weekends from, including openers next week.")
+	parser.add_argument("--from", dest="start", type=str, default=None, help="With --store or --database, the first \
+										 weekend to export (YYYY-MM-DD). Defaults to the earliest stored weekend.")
+	parser.add_argument("--to", dest="end", type=str, default=None, help="With --store or --database, the last \
+										 weekend to export (YYYY-MM-DD). Defaults to the latest stored weekend.")
+	parser.add_argument("--dataset", type=str, default=ALL_DATASETS, choices=EXPORT_DATASETS + [ALL_DATASETS],
+										 help="Dataset to export, or 'all' to bundle every dataset.")
+	parser.add_argument("--format", dest="export_format", type=str, default="csv", choices=EXPORT_FORMATS)
+	parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Number of rows written at a time.")
+	parser.add_argument("--output", type=str, default=None, help="Output file path. Defaults to a name \
+										 derived from the report or date range and dataset.")
+	parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the parsed report cache.")
+	return parser.parse_args()
+
+
+def main():
+	args = parse_args()
+	if args.report is not None:
+		report = ReportCache(args.cache_dir).load(args.report)
+		frames = report_export_frames(ReportViews(report), args.dataset)
+		stem = report_export_stem(report.report_heading)
+	elif args.store is not None:
+		store = FilmRunStore.load(args.store)
+		start = pd.Timestamp(args.start) if args.start else store.weekends[0]
+		end = pd.Timestamp(args.end) if args.end else store.weekends[-1]
+		frames = archive_export_frames(store, args.dataset, start, end)
+		stem = f"bfi-box-office-{start:%Y-%m-%d}-to-{end:%Y-%m-%d}"
+	else:
+		database = ReportDatabase(args.database)
+		weekends = database.weekends()
+		if not weekends:
+			raise SystemExit(f"The report database {args.database} is empty.")
+		start = pd.Timestamp(args.start) if args.start else weekends[0]
+		end = pd.Timestamp(args.end) if args.end else weekends[-1]
+		frames = database_export_frames(database, args.dataset, start, end)
+		stem = f"bfi-box-office-{start:%Y-%m-%d}-to-{end:%Y-%m-%d}"
+
+	output_path = args.output or export_filename(stem, args.dataset, args.export_format)
+	written = write_export(stream_export(frames, args.export_format, args.chunk_size), output_path)
+	print(f"Exported {', '.join(frames)} to {output_path} ({written / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,36 @@
+import argparse
+
+from utils.report_cache import ReportCache, DEFAULT_CACHE_DIR, format_cache_entry
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Inspect or invalidate the cache of parsed BFI weekend box office reports.")
+	parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the parsed report cache.")
+	subparsers = parser.add_subparsers(dest="command", required=True)
+	subparsers.add_parser("info", help="List cached reports and their size on disk.")
+	clear_parser = subparsers.add_parser("clear", help="Invalidate cached reports.")
+	clear_parser.add_argument("xls_files", type=str, nargs="*", help="Reports whose cached parse should be removed. \
+										 Removes every entry if none are given.")
+	return parser.parse_args()
+
+
+def main():
+	args = parse_args()
+	cache = ReportCache(args.cache_dir)
+
+	if args.command == "info":
+		entries = cache.entries()
+		for entry in sorted(entries, key=lambda entry: entry["last_used"], reverse=True):
+			print(format_cache_entry(entry))
+		total_bytes = sum(entry["bytes"] for entry in entries)
+		print(f"{len(entries)} cached reports, {total_bytes / 1024:.1f} KiB in {cache.cache_dir}")
+	elif args.command == "clear":
+		if args.xls_files:
+			removed = sum(cache.invalidate(xls_file) for xls_file in args.xls_files)
+		else:
+			removed = cache.invalidate()
+		print(f"Removed {removed} cached reports from {cache.cache_dir}")
+
+
+if __name__ == "__main__":
+	main()
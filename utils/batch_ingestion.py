@@ -0,0 +1,152 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils.excel_parser import ExcelParser
+from utils.parser_instrumentation import ParserInstrumentation
+from utils.report_schema import concat_typed
+from utils.sheet_scanner import LayoutFingerprint
+
+
+# Consolidated dataset name -> ExcelParser attribute it is collected from
+DATASET_ATTRIBUTES = {
+    "top_15": "top_15_df_with_notes_column",
+    "other_uk_films": "other_uk_films_df",
+    "other_new_releases": "other_new_releases_df",
+    "notes": "notes_on_top_15_table_df",
+    "openers_next_week": "openers_next_week_df",
+}
+
+
+def resolve_report_paths(sources: list[str]) -> list[str]:
+    """
+        Expands directories and glob patterns into a sorted, de-duplicated list of xls report paths.
+    """
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            paths.update(glob.glob(os.path.join(source, "*.xls")))
+        elif glob.has_magic(source):
+            paths.update(glob.glob(source))
+        else:
+            paths.add(source)
+    return sorted(paths)
+
+
+# Layout fingerprint of the last report parsed in this process, tried first on the next one
+_layout_fingerprint: LayoutFingerprint = None
+
+
+def parse_report(excel_report_filepath: str, collect_parse_metrics: bool = False) -> dict:
+    """
+        Parses a single report into its datasets, each tagged with the report heading and source file.
+        Runs inside the worker processes, so any failure is returned rather than raised.
+    """
+    global _layout_fingerprint
+    instrumentation = ParserInstrumentation() if collect_parse_metrics else None
+    parse_metrics = instrumentation.records if instrumentation is not None else []
+    try:
+        excel_parser = ExcelParser(excel_report_filepath, instrumentation, _layout_fingerprint)
+        _layout_fingerprint = excel_parser.layout_fingerprint or _layout_fingerprint
+        datasets = {}
+        for dataset_name, attribute in DATASET_ATTRIBUTES.items():
+            df = getattr(excel_parser, attribute).copy()
+            df.insert(0, "Report", excel_parser.report_heading)
+            df.insert(1, "Source file", os.path.basename(excel_report_filepath))
+            datasets[dataset_name] = df
+        return {"path": excel_report_filepath, "report_heading": excel_parser.report_heading,
+                "datasets": datasets, "error": None, "parse_metrics": parse_metrics,
+                "unmatched_notes": excel_parser.unmatched_notes_on_top_15,
+                "report_details": {"top_15_weekend_gross": excel_parser.total_top_15_weekend_gross,
+                                   "top_15_gross_to_date": excel_parser.total_top_15_gross_to_date,
+                                   "comments": excel_parser.list_of_comments_on_top_15_result}}
+    except Exception as e:
+        return {"path": excel_report_filepath, "report_heading": None,
+                "datasets": None, "error": f"{type(e).__name__}: {e}", "parse_metrics": parse_metrics,
+                "unmatched_notes": [], "report_details": None}
+
+
+class BatchIngestionResult:
+    def __init__(self, datasets: dict, report_headings: dict, failures: dict, elapsed_seconds: float,
+                 parse_metrics: pd.DataFrame = None, unmatched_notes: dict = None, report_details: dict = None):
+        self.datasets = datasets
+        self.report_headings = report_headings
+        self.failures = failures
+        self.elapsed_seconds = elapsed_seconds
+        self.parse_metrics = parse_metrics if parse_metrics is not None else pd.DataFrame()
+        self.unmatched_notes = unmatched_notes if unmatched_notes is not None else {} # path -> notes not parsed
+        # report heading -> the totals and comments of the top 15, which are not part of the datasets
+        self.report_details = report_details if report_details is not None else {}
+
+    def parse_metrics_by_step(self) -> pd.DataFrame:
+        """
+            Wall time, rows scanned and peak allocation of each parsing step, totalled over the batch.
+        """
+        if self.parse_metrics.empty:
+            return self.parse_metrics
+        return (self.parse_metrics.groupby("step", sort=False)
+                .agg(total_seconds=("wall_seconds", "sum"), max_seconds=("wall_seconds", "max"),
+                     rows_scanned=("rows_scanned", "sum"), max_peak_allocated_bytes=("peak_allocated_bytes", "max"))
+                .sort_values("total_seconds", ascending=False))
+
+    @property
+    def num_parsed(self) -> int:
+        return len(self.report_headings)
+
+    @property
+    def num_failed(self) -> int:
+        return len(self.failures)
+
+    def summary(self) -> str:
+        total = self.num_parsed + self.num_failed
+        throughput = total / self.elapsed_seconds if self.elapsed_seconds > 0 else float("inf")
+        lines = [f"Processed {total} reports in {self.elapsed_seconds:.2f}s ({throughput:.1f} reports/s).",
+                 f"Parsed: {self.num_parsed}. Failed: {self.num_failed}."]
+        for path, error in sorted(self.failures.items()):
+            lines.append(f"  {path}: {error}")
+        num_unmatched = sum(len(notes) for notes in self.unmatched_notes.values())
+        if num_unmatched:
+            lines.append(f"Notes not parsed: {num_unmatched}.")
+            for path, notes in sorted(self.unmatched_notes.items()):
+                lines.extend(f"  {path}, note {note['row'] + 1}: {note['note']}" for note in notes)
+        return "\n".join(lines)
+
+
+def ingest_reports(paths: list[str], max_workers: int = None, collect_parse_metrics: bool = False) -> BatchIngestionResult:
+    """
+        Parses the given reports across a process pool. A report that fails to parse is recorded
+        in the result's failures and does not abort the rest of the batch.
+    """
+    start = time.perf_counter()
+    results = []
+    failures = {}
+    parse_metrics = []
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(parse_report, path, collect_parse_metrics): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e: # e.g. a worker process dying mid-parse
+                failures[futures[future]] = f"{type(e).__name__}: {e}"
+                continue
+            parse_metrics.extend(result["parse_metrics"])
+            if result["error"] is not None:
+                failures[result["path"]] = result["error"]
+            else:
+                results.append(result)
+
+    results.sort(key=lambda result: result["path"])
+    datasets = {}
+    for dataset_name in DATASET_ATTRIBUTES:
+        frames = [result["datasets"][dataset_name] for result in results]
+        datasets[dataset_name] = concat_typed(frames, ignore_index=True) if frames else pd.DataFrame()
+    report_headings = {result["path"]: result["report_heading"] for result in results}
+    unmatched_notes = {result["path"]: result["unmatched_notes"] for result in results if result["unmatched_notes"]}
+    report_details = {result["report_heading"]: result["report_details"] for result in results}
+
+    return BatchIngestionResult(datasets, report_headings, failures, time.perf_counter() - start,
+                                pd.DataFrame(parse_metrics), unmatched_notes, report_details)
@@ -1,10 +1,42 @@
 from dash import dash_table, html
 
+DEFAULT_PAGE_SIZE = 25
 
-def produce_dash_table_with_common_styling(df):
+
+def server_side_table_properties(table_id, page_size=DEFAULT_PAGE_SIZE):
+	"""
+		DataTable properties for tables whose paging, sorting and filtering are done by a server callback,
+		so the browser only ever holds the current page of rows.
+	"""
+	return {
+		"id": table_id,
+		"data": [],
+		"page_current": 0,
+		"page_size": page_size,
+		"page_action": "custom",
+		"sort_action": "custom",
+		"sort_mode": "multi",
+		"sort_by": [],
+		"filter_action": "custom",
+		"filter_query": "",
+	}
+
+
+def produce_dash_table_with_common_styling(df, table_id=None, numeric_columns=(), page_size=DEFAULT_PAGE_SIZE):
+	"""
+		Without a table_id the whole DataFrame is embedded in the table. With a table_id only the columns are
+		taken from df, and the rows are served a page at a time by a callback on that id.
+	"""
+	columns = [{"name": col, "id": col} for col in df.columns]
+	if table_id is None:
+		table_properties = {"data": df.to_dict("records")}
+	else:
+		table_properties = server_side_table_properties(table_id, page_size)
+		for column in columns:
+			column["type"] = "numeric" if column["id"] in numeric_columns else "text" # drives how typed filters are parsed
 	return dash_table.DataTable(
-		data=df.to_dict("records"),
-		columns=[{"name": col, "id": col} for col in df.columns],
+		**table_properties,
+		columns=columns,
 		style_table={
 			"height": "70vh",
 			"overflowY": "auto",
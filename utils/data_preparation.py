@@ -1,29 +1,70 @@
+import numpy as np
 import pandas as pd
 import math
 
+DEFAULT_GBP_VALUE_COLUMNS = ['Weekend Gross', 'Site average', 'Total Gross to date']
+DEFAULT_PERCENTAGE_VALUE_COLUMNS = ["% change on last week"]
+
+# lookup tables for formatting each group of three digits
+UNPADDED_DIGIT_GROUPS = np.array([str(i) for i in range(1000)], dtype=object)
+SEPARATED_DIGIT_GROUPS = np.array([f",{i:03d}" for i in range(1000)], dtype=object)
+
+
+def insert_thousands_separators(values: np.ndarray) -> np.ndarray:
+	"""
+		Formats an array of integers with comma thousands separators, e.g. 1234567 -> '1,234,567',
+		working one digit group at a time across the whole array rather than one value at a time.
+	"""
+	values = np.asarray(values, dtype=np.int64)
+	remaining = np.abs(values)
+	digit_groups = [remaining % 1000]
+	num_groups = np.ones(len(values), dtype=np.int64)
+	remaining = remaining // 1000
+	while remaining.any():
+		num_groups += remaining > 0
+		digit_groups.append(remaining % 1000)
+		remaining = remaining // 1000
+
+	formatted = np.empty(len(values), dtype=object)
+	for group_count in range(1, len(digit_groups) + 1):
+		mask = num_groups == group_count
+		if not mask.any():
+			continue
+		# the leading group is unpadded, every following group is zero-padded after a comma
+		pieces = UNPADDED_DIGIT_GROUPS[digit_groups[group_count - 1][mask]]
+		for group_index in range(group_count - 2, -1, -1):
+			pieces = pieces + SEPARATED_DIGIT_GROUPS[digit_groups[group_index][mask]]
+		formatted[mask] = pieces
+	return np.where(values < 0, "-" + formatted, formatted)
+
+
 class DataPreparation:
 
-	def __init__(self):
-		self.gbp_value_columns = ['Weekend Gross', 'Site average', 'Total Gross to date']
-		self.percentage_value_columns = ["% change on last week"] # allowing for more to be added later on
+	def __init__(self, gbp_value_columns: list[str] = None, percentage_value_columns: list[str] = None):
+		self.gbp_value_columns = list(DEFAULT_GBP_VALUE_COLUMNS if gbp_value_columns is None else gbp_value_columns)
+		self.percentage_value_columns = list(DEFAULT_PERCENTAGE_VALUE_COLUMNS if percentage_value_columns is None \
+																			 else percentage_value_columns)
 
 	@staticmethod
 	def format_gbp_currency(value: int) -> str:
-		str_value = str(round(value))
+		return f"£{round(value):,}"
 
-		def insert_commas(str_value, counter):
-			if len(str_value) <= 3:
-				return str_value
-
-			result = insert_commas(str_value[:-3], counter + 3)
-			return result + "," + str_value[-3:]
-
-		str_value_with_commas = insert_commas(str_value, counter=0)
-		return "£" + str_value_with_commas
+	@staticmethod
+	def format_gbp_currency_series(values: pd.Series) -> pd.Series:
+		"""
+			Formats a whole column of GBP values at once, e.g. 1234567.4 -> '£1,234,567'. Missing values stay NaN.
+		"""
+		numeric = pd.to_numeric(values, errors="coerce")
+		present = numeric.notna().to_numpy()
+		formatted = np.full(len(numeric), np.nan, dtype=object)
+		formatted[present] = "£" + insert_thousands_separators(numeric.to_numpy()[present].round())
+		return pd.Series(formatted, index=values.index, name=values.name)
 
 	def restore_string_formatting_to_gbp_values(self, df: pd.DataFrame, column_names: list[str]) -> pd.DataFrame:
+		df = df.copy()
 		for column_name in column_names:
-			df[column_name] = df[column_name].apply(self.format_gbp_currency)
+			if column_name in df.columns:
+				df[column_name] = self.format_gbp_currency_series(df[column_name])
 		return df
 
 	@staticmethod
@@ -34,13 +75,31 @@ class DataPreparation:
 		else:
 			return value
 
+	@staticmethod
+	def format_percentage_series(values: pd.Series) -> pd.Series:
+		"""
+			Formats a whole column of decimals as percentages at once, e.g. -0.53 -> '-53%'. Missing values stay NaN.
+		"""
+		numeric = pd.to_numeric(values, errors="coerce")
+		present = numeric.notna().to_numpy()
+		formatted = np.full(len(numeric), np.nan, dtype=object)
+		formatted[present] = (numeric.to_numpy()[present] * 100).round().astype(np.int64).astype(str).astype(object) + "%"
+		return pd.Series(formatted, index=values.index, name=values.name)
+
 	def restore_string_formatting_to_percentage_values(self, df: pd.DataFrame, column_names: list[str]) -> pd.DataFrame:
+		df = df.copy()
 		for column_name in column_names:
-			df[column_name] = df[column_name].apply(lambda x: self.convert_decimal_to_percentage_str(x))
+			if column_name in df.columns:
+				df[column_name] = self.format_percentage_series(df[column_name])
 		return df
 
 	def restore_original_formatting(self, df_table: pd.DataFrame) -> pd.DataFrame:
+		"""
+			Returns a formatted copy of the table; the parser's DataFrame is left untouched.
+		"""
 		df_reformatted = self.restore_string_formatting_to_gbp_values(df_table, self.gbp_value_columns)
 		df_reformatted = self.restore_string_formatting_to_percentage_values(df_reformatted, self.percentage_value_columns)
-		df_reformatted.fillna("-", inplace=True)
-		return df_reformatted
\ No newline at end of file
+		columns_with_missing_values = df_reformatted.columns[df_reformatted.isna().any()]
+		for column_name in columns_with_missing_values:
+			df_reformatted[column_name] = df_reformatted[column_name].astype(object).fillna("-")
+		return df_reformatted
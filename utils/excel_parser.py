@@ -1,48 +1,123 @@
+import contextlib
 import pandas as pd
 import re
 import xlrd
 
+from utils.notes_parser import join_notes_column, parse_notes
+from utils.parser_instrumentation import ParserInstrumentation
+from utils.report_schema import apply_schema, country_mask
+from utils.sheet_scanner import (LayoutFingerprint, SheetScanner, COMMENT, NOTE, OPENERS, OTHER_UK_FILMS_TABLE,
+                                 OTHER_NEW_RELEASES_TABLE, COMMENTS_SECTION, NOTES_SECTION, OPENERS_SECTION)
+
+
+PARSER_VERSION = "3" # bump whenever a change to the parser alters its output, so cached parses are invalidated
+
 
 class ExcelParser:
-    def __init__(self, excel_report_filepath):
+    # Parsing steps in the order they run: (attribute the step's result is stored under, step method name)
+    PARSE_STEPS = (
+      ("workbook", "_open_workbook"),
+      ("excel_sheet", "_get_excel_sheet"),
+      ("sheet_scanner", "_scan_sheet"), # single pass over the sheet; all tables are sliced from its grid
+      ("layout_fingerprint", "_learn_layout_fingerprint"), # for the next report to scan
+      ("report_heading", "_get_report_heading"),
+      ("column_names", "_get_column_names"),
+      ("top_15_df", "_read_top_15_table_to_df"),
+      ("total_top_15_weekend_gross", "_get_top_15_weekend_gross"),
+      ("total_top_15_gross_to_date", "_get_top_15_total_gross_to_date"),
+      (None, "_check_for_change_in_footnotes_below_top_15_table"), # to check layout is as expected before continuing to read second table
+      ("end_boundary_of_other_uk_films_table", "_find_end_of_other_uk_films_table"),
+      ("end_boundary_of_other_new_releases_table", "_find_end_of_other_new_releases_table"),
+      ("other_uk_films_df", "_read_other_uk_films_table_to_df"),
+      ("other_new_releases_df", "_read_other_new_releases_table_to_df"),
+      ("start_boundary_of_comments_on_top_15_section", "_find_start_boundary_of_comments_on_top_15"),
+      ("start_boundary_of_notes_on_top_15_section", "_find_start_boundary_of_notes_for_top_15_section"),
+      ("list_of_comments_on_top_15_result", "_read_comments_on_top_15_to_list"),
+      ("start_boundary_of_openers_next_week_table", "_find_start_of_openers_next_week_table"),
+      ("notes_on_top_15_table_df", "_read_notes_for_top_15_table_to_df"),
+      ("top_15_df_with_notes_column", "_supplement_top_15_df_with_notes_column"),
+      ("openers_next_week_df", "_read_openers_next_week_table_to_df"),
+      (None, "_apply_typed_schema"), # categoricals and downcast integers, once every table is read and merged
+    )
+
+    # Steps that read the sheet from the xls file, which a sheet already in memory does not need
+    WORKBOOK_STEPS = ("_open_workbook", "_get_excel_sheet")
+
+    # Tables the typed schema is applied to
+    TYPED_TABLE_ATTRIBUTES = ("top_15_df", "other_uk_films_df", "other_new_releases_df",
+                              "top_15_df_with_notes_column", "openers_next_week_df")
+
+    def __init__(self, excel_report_filepath, instrumentation: ParserInstrumentation = None,
+                 layout_fingerprint: LayoutFingerprint = None):
+      self.excel_report_filepath = excel_report_filepath
+      self.instrumentation = instrumentation # opt-in per-step timing and memory metrics
+      self.layout_fingerprint = layout_fingerprint # learned from a previous report, tried before a full scan
+      self._run_parse_steps()
+
+    @classmethod
+    def from_sheet(cls, excel_sheet, excel_report_filepath=None, instrumentation: ParserInstrumentation = None,
+                   layout_fingerprint: LayoutFingerprint = None) -> "ExcelParser":
+      """
+          Parses a sheet that is already in memory, e.g. a synthetic sheet, running every step but the workbook steps.
+      """
+      excel_parser = cls.__new__(cls)
+      excel_parser.excel_report_filepath = excel_report_filepath
+      excel_parser.instrumentation = instrumentation
+      excel_parser.layout_fingerprint = layout_fingerprint
+      excel_parser.workbook = None
+      excel_parser.excel_sheet = excel_sheet
+      excel_parser._run_parse_steps(skip_steps=cls.WORKBOOK_STEPS)
+      return excel_parser
+
+    def _run_parse_steps(self, skip_steps=()):
+      with self.instrumentation.parse_session() if self.instrumentation is not None else contextlib.nullcontext():
+         for attribute, step_name in self.PARSE_STEPS:
+            if step_name not in skip_steps:
+               self._run_parse_step(attribute, step_name)
+
+    def _run_parse_step(self, attribute, step_name):
+      step = getattr(self, step_name)
+      if self.instrumentation is None:
+         result = step()
+      else:
+         result = self.instrumentation.run_step(self.excel_report_filepath, step_name, step)
+      if attribute is not None:
+         setattr(self, attribute, result)
+
+    def _open_workbook(self):
       try:
-        self.workbook = xlrd.open_workbook(excel_report_filepath)
+        return xlrd.open_workbook(self.excel_report_filepath)
       except NotImplementedError:
          print("This program is coded to run on xls files, not xlsx. Try downgrading the input file to xls first.")
-      self.excel_sheet = self.workbook.sheet_by_index(0)
-      self.report_heading = self.excel_sheet.cell_value(0, 0)
-      self.column_names = self._get_column_names()
-      self.top_15_df = self._read_top_15_table_to_df()
-      self.total_top_15_weekend_gross = self._get_top_15_weekend_gross()
-      self.total_top_15_gross_to_date = self._get_top_15_total_gross_to_date()
-      self._check_for_change_in_footnotes_below_top_15_table() # to check layout is as expected before continuing to read second table
-      self.end_boundary_of_other_uk_films_table = self._find_end_of_other_uk_films_table()
-      self.end_boundary_of_other_new_releases_table = self._find_end_of_other_new_releases_table()
-      self.other_uk_films_df = self._read_other_uk_films_table_to_df()
-      self.other_new_releases_df = self._read_other_new_releases_table_to_df()
-      self.start_boundary_of_comments_on_top_15_section = self._find_start_boundary_of_comments_on_top_15()
-      self.start_boundary_of_notes_on_top_15_section = self._find_start_boundary_of_notes_for_top_15_section()
-      self.list_of_comments_on_top_15_result = self._read_comments_on_top_15_to_list()
-      self.start_boundary_of_openers_next_week_table = self._find_start_of_openers_next_week_table()
-      self.notes_on_top_15_table_df = self._read_notes_for_top_15_table_to_df()
-      self.top_15_df_with_notes_column = self._supplement_top_15_df_with_notes_column()
-      self.openers_next_week_df = self._read_openers_next_week_table_to_df()
+
+    def _get_excel_sheet(self):
+      return self.workbook.sheet_by_index(0)
+
+    def _scan_sheet(self) -> SheetScanner:
+      return SheetScanner(self.excel_sheet, fingerprint=self.layout_fingerprint)
+
+    def _learn_layout_fingerprint(self) -> LayoutFingerprint:
+      if self.sheet_scanner.fingerprint_matched:
+         return self.layout_fingerprint
+      return LayoutFingerprint.from_scanner(self.sheet_scanner)
+
+    def _get_report_heading(self) -> str:
+      return self.sheet_scanner.cell_value(0, 0)
 
     def _get_column_names(self):
        column_names = []
        for col_ind in range(0, 10):
-          column_name = self.excel_sheet.cell_value(1, col_ind)
+          column_name = self.sheet_scanner.cell_value(1, col_ind)
           column_names.append(column_name)
        return column_names
 
     def _read_top_15_table_to_df(self):
-      df_top15 = pd.read_excel(self.workbook, header=1, nrows=15, usecols=range(10))
-      df_top15.columns = self.column_names
+      df_top15 = self.sheet_scanner.read_table(range(2, 17), self.column_names)
       df_top15["% change on last week"] = df_top15["% change on last week"].apply(pd.to_numeric, errors="coerce")
       return df_top15
 
     def _get_top_15_weekend_gross(self) -> float:
-      cell_d_18 = self.excel_sheet.cell_value(17, 3)
+      cell_d_18 = self.sheet_scanner.cell_value(17, 3)
       if cell_d_18 == "":
          raise ValueError("Expected cell D18 to contain the weekend gross total figure but it was empty.\
                \nCheck xls document layout as coordinates may have changed.")
@@ -50,7 +125,7 @@ class ExcelParser:
          return cell_d_18
 
     def _get_top_15_total_gross_to_date(self) -> float:
-      cell_j_18 = self.excel_sheet.cell_value(17, 9)
+      cell_j_18 = self.sheet_scanner.cell_value(17, 9)
       if cell_j_18 == "":
          raise ValueError("Expected cell D18 to contain the weekend gross total figure but it was empty.\
                \nCheck xls document layout as coordinates may have changed.")
@@ -58,11 +133,10 @@ class ExcelParser:
          return cell_j_18
 
     def _check_for_empty_row(self, row_index) -> bool:
-       row = self.excel_sheet.row_values(row_index)
-       return all(cell == "" or cell is None for cell in row)
+       return self.sheet_scanner.is_blank(row_index)
 
     def _check_for_change_in_footnotes_below_top_15_table(self):
-        cell_b_19 = self.excel_sheet.cell_value(18, 1)
+        cell_b_19 = self.sheet_scanner.cell_value(18, 1)
         if not re.match(r"Note: 'Weekend gross' figures will include Previews.+", cell_b_19):
           raise ValueError("The footnote regarding weekend gross figures including previews was expected in cell B19.\n\
                 Examine layout of Excel sheet to see changes.")
@@ -73,18 +147,15 @@ class ExcelParser:
            print("Ready to read Other UK Films Table.")
 
     def _find_end_of_other_uk_films_table(self) -> int:
-        if "Other UK films" not in self.excel_sheet.row_values(20):
+        if self.sheet_scanner.anchors.get(OTHER_UK_FILMS_TABLE) != 20:
            raise ValueError("Program is written to expect 'Other UK films' header in row 20 (Excel Row 21).")
         else:
-           for row_index in range(21, self.excel_sheet.nrows):
-              if self._check_for_empty_row(row_index):
-                 return row_index
+           return self.sheet_scanner.table_ends.get(OTHER_UK_FILMS_TABLE)
 
     def _read_other_uk_films_table_to_df(self) -> pd.DataFrame:
         index_of_empty_row_after_table = self.end_boundary_of_other_uk_films_table
         num_rows = index_of_empty_row_after_table - 21
-        df_other_uk_films = pd.read_excel(self.workbook, skiprows=21, nrows=num_rows, header=None, usecols=range(10))
-        df_other_uk_films.columns = self.column_names
+        df_other_uk_films = self.sheet_scanner.read_table(range(21, 21 + num_rows), self.column_names)
         df_other_uk_films["% change on last week"] = df_other_uk_films["% change on last week"].apply(pd.to_numeric, errors="coerce")
         return df_other_uk_films
 
@@ -92,115 +163,80 @@ class ExcelParser:
        expected_row_ind_of_table_header = self.end_boundary_of_other_uk_films_table + 1
 
          # Checking for "Other new releases" table header in the next two rows after end of Other UK films table
-       if "Other new releases" not in self.excel_sheet.row_values(expected_row_ind_of_table_header):
+       if self.sheet_scanner.anchors.get(OTHER_NEW_RELEASES_TABLE) != expected_row_ind_of_table_header:
            raise ValueError("Program is written to expect 'Other new releases' header two rows after 'Other UK Films' table ends.\
                             String value not found in this row. Check document layout.")
        else:
-           for row_index in range(expected_row_ind_of_table_header + 1, self.excel_sheet.nrows):
-              if self._check_for_empty_row(row_index):
-                 return row_index
+           return self.sheet_scanner.table_ends.get(OTHER_NEW_RELEASES_TABLE)
 
     def _read_other_new_releases_table_to_df(self) -> pd.DataFrame:
         index_of_empty_row_after_new_releases_table = self.end_boundary_of_other_new_releases_table
         index_of_starting_row_of_new_releases_table = self.end_boundary_of_other_uk_films_table + 2 # this approach would have to be altered if the layout were to ever vary
         num_rows = index_of_empty_row_after_new_releases_table - index_of_starting_row_of_new_releases_table
-        df_other_new_releases = pd.read_excel(self.workbook, skiprows=index_of_starting_row_of_new_releases_table, nrows=num_rows, header=None, usecols=range(10))
-        df_other_new_releases.columns = self.column_names
+        df_other_new_releases = self.sheet_scanner.read_table(range(index_of_starting_row_of_new_releases_table,
+                                                                    index_of_starting_row_of_new_releases_table + num_rows),
+                                                              self.column_names)
         df_other_new_releases["% change on last week"] = df_other_new_releases["% change on last week"].apply(pd.to_numeric, errors="coerce")
         return df_other_new_releases
 
     def _find_start_boundary_of_comments_on_top_15(self) -> int:
-       for row_index in range(self.end_boundary_of_other_new_releases_table, self.excel_sheet.nrows):
-         row = self.excel_sheet.row_values(row_index)
-         if "Comments on this week's top 15 results" in row:
-            return row_index + 1
+       if COMMENTS_SECTION in self.sheet_scanner.anchors:
+          return self.sheet_scanner.anchors[COMMENTS_SECTION] + 1
        raise ValueError("Expected to find header 'Comments on this week's top 15 results' in workbook sheet after\
                        end of Other New Releases table. String not found in search of rows. Check document layout.")
 
     def _find_start_boundary_of_notes_for_top_15_section(self) -> int:
-       for row_index in range(self.start_boundary_of_comments_on_top_15_section, self.excel_sheet.nrows):
-         row = self.excel_sheet.row_values(row_index)
-         if "Notes for Top 15 table:" in row:
-            return row_index
+       if NOTES_SECTION in self.sheet_scanner.anchors:
+          return self.sheet_scanner.anchors[NOTES_SECTION]
        raise ValueError("Expected to find header 'Notes for Top 15 table:' in workbook sheet after\
                        end of 'Comments on this week's top 15 results' section. String not found in search of rows. \
                         Check document layout.")
 
     def _read_comments_on_top_15_to_list(self) -> list:
-       row_index_section_start = self.start_boundary_of_comments_on_top_15_section
-       row_index_section_end = self.start_boundary_of_notes_on_top_15_section
        comments_list = []
-       for row_index in range(row_index_section_start, row_index_section_end):
-          if self._check_for_empty_row(row_index) == False:
-             comments_list.append(self.excel_sheet.cell_value(row_index, 1)) # expects the value to be in column B
+       for row_index in self.sheet_scanner.rows_of_kind(COMMENTS_SECTION, COMMENT):
+          comments_list.append(self.sheet_scanner.cell_value(row_index, 1)) # expects the value to be in column B
        return comments_list
 
     def _find_start_of_openers_next_week_table(self) -> int:
-       for row_index in range(self.start_boundary_of_notes_on_top_15_section, self.excel_sheet.nrows):
-         row = self.excel_sheet.row_values(row_index)
-         if "Openers next week:" in row:
-            return row_index
+       if OPENERS_SECTION in self.sheet_scanner.anchors:
+          return self.sheet_scanner.anchors[OPENERS_SECTION]
        raise ValueError("Expected to find header 'Openers next week:' in workbook sheet after\
                        end of 'Notes for Top 15 table' section. String not found in search of rows. \
                         Check document layout.")
 
     def _read_notes_for_top_15_table_to_list(self) -> list:
-       row_index_section_start = self.start_boundary_of_notes_on_top_15_section
-       row_index_section_end = self.start_boundary_of_openers_next_week_table
        notes_list = []
-       for row_index in range(row_index_section_start + 1, row_index_section_end):
-          if self._check_for_empty_row(row_index) == False:
-             notes_list.append(self.excel_sheet.cell_value(row_index, 1)) # expects the value to be in column B
+       for row_index in self.sheet_scanner.rows_of_kind(NOTES_SECTION, NOTE):
+          notes_list.append(self.sheet_scanner.cell_value(row_index, 1)) # expects the value to be in column B
        return notes_list
 
     def _read_notes_for_top_15_table_to_df(self) -> pd.DataFrame:
-       films = []
-       notes = []
-
-       notes_list = self._read_notes_for_top_15_table_to_list()
-
-       for note in notes_list:
-          split_note = note.split(" - ")
-          film_and_distributor = split_note[0]
-          note = split_note[1]
-          pattern = r"^(.*?) \([^\)]+\)$"
-          match = re.match(pattern, film_and_distributor)
-          if match:
-             film = match.group(1)
-             if film not in films:
-                films.append(film)
-                notes.append(note)
-             else:
-                film_index_in_list = films.index(film)
-                notes[film_index_in_list] += "\n" + note
-          else:
-             raise ValueError("Regex not producing match. Check pattern.")
-
-       df_notes_on_top_15 = pd.DataFrame({
-          "Film": films,
-          "Notes": notes
-        })
-
-       return df_notes_on_top_15
+       notes_parse_result = parse_notes(self._read_notes_for_top_15_table_to_list())
+       self.unmatched_notes_on_top_15 = notes_parse_result.unmatched
+       for unmatched_note in notes_parse_result.unmatched:
+          print(f"Note not parsed ({unmatched_note['reason']}): {unmatched_note['note']}")
+       return notes_parse_result.notes
 
     def _supplement_top_15_df_with_notes_column(self) -> pd.DataFrame:
-      merged_df = pd.merge(self.top_15_df, self.notes_on_top_15_table_df, on="Film", how="left")
-      return merged_df
+      return join_notes_column(self.top_15_df, self.notes_on_top_15_table_df)
 
     def _read_openers_next_week_table_to_df(self) -> pd.DataFrame:
-        num_rows = self.excel_sheet.nrows - self.start_boundary_of_openers_next_week_table
-        df_openers_next_week = pd.read_excel(self.workbook, skiprows=self.start_boundary_of_openers_next_week_table + 1, \
-                                             nrows=num_rows, header=None, \
-                                             usecols=[1, 2, 4])
-        df_openers_next_week.columns = ["Film", "Country of Origin", "Distributor"]
+        df_openers_next_week = self.sheet_scanner.read_table(self.sheet_scanner.rows_of_kind(OPENERS_SECTION, OPENERS),
+                                                             ["Film", "Country of Origin", "Distributor"],
+                                                             usecols=[1, 2, 4])
         return df_openers_next_week
 
+    def _apply_typed_schema(self) -> None:
+        for attribute in self.TYPED_TABLE_ATTRIBUTES:
+            setattr(self, attribute, apply_schema(getattr(self, attribute)))
+
     @staticmethod
     def filter_for_UK_films(df_top_15: pd.DataFrame) -> pd.DataFrame:
         """
             Returns dataframe of UK films in the top 15 for merging with the UK films dataset.
         """
-        mask = df_top_15["Country of Origin"].apply(lambda x: "UK" in x.split("/"))
+        mask = country_mask(df_top_15["Country of Origin"], "UK")
         return df_top_15[mask]
 
     @staticmethod
@@ -0,0 +1,234 @@
+import tempfile
+import zipfile
+from typing import Iterator
+
+import pandas as pd
+
+from utils.excel_parser import ExcelParser
+from utils.film_run_store import FilmRunStore, parse_report_weekend
+from utils.report_database import ReportDatabase
+from utils.report_schema import concat_typed
+from utils.report_views import ReportViews, VIEW_OPTIONS
+
+
+EXPORT_FORMATS = ("csv", "xlsx", "parquet")
+EXPORT_DATASETS = [option["value"] for option in VIEW_OPTIONS]
+ALL_DATASETS = "all"
+DEFAULT_CHUNK_SIZE = 10000
+FILE_COPY_CHUNK_BYTES = 1024 * 1024
+
+
+class _ChunkSink:
+    """
+        Write-only file-like object collecting the bytes written by the export writers
+        until the streaming generator drains them.
+    """
+    def __init__(self):
+        self._chunks = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_row_chunks(df: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, max(len(df), 1), chunk_size): # an empty frame still yields once, for its header
+        yield df.iloc[start:start + chunk_size]
+
+
+def _write_csv(df: pd.DataFrame, sink, chunk_size: int) -> Iterator[None]:
+    for chunk_index, chunk in enumerate(_iter_row_chunks(df, chunk_size)):
+        sink.write(chunk.to_csv(index=False, header=chunk_index == 0).encode("utf-8"))
+        yield
+
+
+def _write_parquet(df: pd.DataFrame, sink, chunk_size: int) -> Iterator[None]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow. Install it with 'conda install pyarrow'.")
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in _iter_row_chunks(df, chunk_size):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)) # one row group per chunk
+            yield
+
+
+def _write_xlsx(frames: dict[str, pd.DataFrame], sink, chunk_size: int) -> Iterator[None]:
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ImportError("xlsx export requires openpyxl. Install it with 'conda install openpyxl'.")
+    # write-only mode streams rows to temporary files instead of holding every cell in memory
+    workbook = Workbook(write_only=True)
+    for dataset_id, df in frames.items():
+        sheet = workbook.create_sheet(title=dataset_id[:31])
+        sheet.append(list(df.columns))
+        for chunk in _iter_row_chunks(df, chunk_size):
+            for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False):
+                sheet.append(list(row))
+            yield
+    # xlsx is a zip archive only complete once saved, so it is spooled to disk and then streamed from there
+    with tempfile.TemporaryFile() as xlsx_file:
+        workbook.save(xlsx_file)
+        xlsx_file.seek(0)
+        for data in iter(lambda: xlsx_file.read(FILE_COPY_CHUNK_BYTES), b""):
+            sink.write(data)
+            yield
+
+
+TABLE_WRITERS = {"csv": _write_csv, "parquet": _write_parquet}
+
+
+def _write_zip_bundle(frames: dict[str, pd.DataFrame], export_format: str, sink, chunk_size: int) -> Iterator[None]:
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for dataset_id, df in frames.items():
+            with archive.open(f"{dataset_id}.{export_format}", "w", force_zip64=True) as entry:
+                yield from TABLE_WRITERS[export_format](df, entry, chunk_size)
+    yield
+
+
+def stream_export(frames: dict[str, pd.DataFrame], export_format: str,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+        Yields the exported file as a sequence of byte chunks, writing chunk_size rows at a time.
+        A single dataset is exported as one file; several datasets are bundled into one xlsx workbook
+        (one sheet each) or, for csv and parquet, into a zip archive of one file each.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}'. Expected one of: {', '.join(EXPORT_FORMATS)}.")
+    sink = _ChunkSink()
+    if export_format == "xlsx":
+        writer = _write_xlsx(frames, sink, chunk_size)
+    elif len(frames) == 1:
+        writer = TABLE_WRITERS[export_format](next(iter(frames.values())), sink, chunk_size)
+    else:
+        writer = _write_zip_bundle(frames, export_format, sink, chunk_size)
+    for _ in writer:
+        data = sink.drain()
+        if data:
+            yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def export_filename(stem: str, dataset_selection: str, export_format: str) -> str:
+    extension = "zip" if dataset_selection == ALL_DATASETS and export_format != "xlsx" else export_format
+    return f"{stem}-{dataset_selection}.{extension}"
+
+
+def _selected_dataset_ids(dataset_selection: str) -> list[str]:
+    if dataset_selection == ALL_DATASETS:
+        return EXPORT_DATASETS
+    if dataset_selection not in EXPORT_DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset_selection}'. \
+                         Expected one of: {', '.join(EXPORT_DATASETS + [ALL_DATASETS])}.")
+    return [dataset_selection]
+
+
+def report_export_frames(report_views: ReportViews, dataset_selection: str) -> dict[str, pd.DataFrame]:
+    """
+        The unformatted datasets of a single report, for export.
+    """
+    return {dataset_id: report_views.raw_dataset(dataset_id) for dataset_id in _selected_dataset_ids(dataset_selection)}
+
+
+def report_export_stem(report_heading: str) -> str:
+    weekend_start, weekend_end = parse_report_weekend(report_heading)
+    return f"bfi-box-office-{weekend_start:%Y-%m-%d}-{weekend_end:%d}"
+
+
+# Export dataset -> run tables it is built from, for archive exports
+DATASET_RUN_TABLES = {
+    "top-15": ["top_15"],
+    "uk-in-top-15": ["top_15"],
+    "new-releases-in-top-15": ["top_15"],
+    "all-uk-films": ["top_15", "other_uk_films"],
+    "all-new-releases": ["top_15", "other_new_releases"],
+}
+
+
+def _run_table_export_frames(table: pd.DataFrame, dataset_ids: list[str]) -> dict[str, pd.DataFrame]:
+    """
+        Builds the datasets from a long table of run table rows of many weekends, tagged by 'Table'.
+    """
+    top_15 = table[table["Table"] == "top_15"]
+    uk_in_top_15 = ExcelParser.filter_for_UK_films(top_15)
+    new_releases_in_top_15 = ExcelParser.filter_for_new_releases(top_15)
+    frame_builders = {
+        "top-15": lambda: top_15,
+        "uk-in-top-15": lambda: uk_in_top_15,
+        "new-releases-in-top-15": lambda: new_releases_in_top_15,
+        "all-uk-films": lambda: concat_typed([uk_in_top_15, table[table["Table"] == "other_uk_films"]]),
+        "all-new-releases": lambda: concat_typed([new_releases_in_top_15, table[table["Table"] == "other_new_releases"]]),
+    }
+    frames = {}
+    for dataset_id in dataset_ids:
+        frames[dataset_id] = (frame_builders[dataset_id]()
+                              .drop(columns=["Film key", "Distributor key"], errors="ignore")
+                              .sort_values(["Weekend start", "Rank"], kind="stable"))
+    return frames
+
+
+def archive_export_frames(store: FilmRunStore, dataset_selection: str,
+                          start: pd.Timestamp = None, end: pd.Timestamp = None) -> dict[str, pd.DataFrame]:
+    """
+        The datasets of every weekend in the film run store starting within [start, end], for export.
+        Openers are not kept in the store, so they cannot be exported for a date range.
+    """
+    table = store.table
+    if table.empty:
+        raise ValueError("The film run store is empty.")
+    mask = pd.Series(True, index=table.index)
+    if start is not None:
+        mask &= table["Weekend start"] >= start
+    if end is not None:
+        mask &= table["Weekend start"] <= end
+    table = table[mask]
+
+    dataset_ids = _selected_dataset_ids(dataset_selection)
+    if dataset_selection == ALL_DATASETS:
+        dataset_ids = [dataset_id for dataset_id in dataset_ids if dataset_id != "openers-next-week"]
+    elif dataset_selection == "openers-next-week":
+        raise ValueError("Openers next week are not kept in the film run store, so can only be exported per report.")
+    return _run_table_export_frames(table, dataset_ids)
+
+
+def database_export_frames(database: ReportDatabase, dataset_selection: str,
+                           start: pd.Timestamp = None, end: pd.Timestamp = None) -> dict[str, pd.DataFrame]:
+    """
+        The datasets of every weekend in the report database starting within [start, end], for export.
+        Only the run tables the selected datasets are built from are read from the database.
+    """
+    dataset_ids = _selected_dataset_ids(dataset_selection)
+    run_table_ids = [dataset_id for dataset_id in dataset_ids if dataset_id in DATASET_RUN_TABLES]
+    table_names = sorted({table_name for dataset_id in run_table_ids for table_name in DATASET_RUN_TABLES[dataset_id]})
+    frames = {}
+    if run_table_ids:
+        frames.update(_run_table_export_frames(database.weekend_entries(table_names, start, end), run_table_ids))
+    if "openers-next-week" in dataset_ids:
+        frames["openers-next-week"] = database.openers(start, end)
+    return {dataset_id: frames[dataset_id] for dataset_id in dataset_ids}
+
+
+def write_export(chunks: Iterator[bytes], output_path: str) -> int:
+    written = 0
+    with open(output_path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            written += len(chunk)
+    return written
@@ -0,0 +1,181 @@
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+
+import pandas as pd
+
+from utils.report_schema import concat_typed, country_matrix
+
+
+# Long-table dataset name -> attribute of a parsed report (ExcelParser or ParsedReport) holding that table
+RUN_TABLE_ATTRIBUTES = {
+    "top_15": "top_15_df_with_notes_column",
+    "other_uk_films": "other_uk_films_df",
+    "other_new_releases": "other_new_releases_df",
+}
+
+REPORT_HEADING_DATES_PATTERN = re.compile(r"(\d{2}/\d{2}/\d{4})\s*-\s*(\d{2}/\d{2}/\d{4})")
+NON_ALPHANUMERIC_PATTERN = re.compile(r"[^0-9a-z]+")
+
+
+def normalise_key(value: str) -> str:
+    """
+        Normalises a film title or distributor name into a join key, so that differences in
+        capitalisation, accents, punctuation and '&' vs 'and' between reports do not split a film's run.
+    """
+    value = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode("ascii")
+    value = value.casefold().replace("&", " and ")
+    return NON_ALPHANUMERIC_PATTERN.sub(" ", value).strip()
+
+
+def parse_report_weekend(report_heading: str) -> tuple[pd.Timestamp, pd.Timestamp]:
+    match = REPORT_HEADING_DATES_PATTERN.search(report_heading)
+    if not match:
+        raise ValueError(f"Could not find the weekend dates in report heading '{report_heading}'. \
+                         Expected the format 'BFI Weekend Box Office DD/MM/YYYY - DD/MM/YYYY'.")
+    weekend_start, weekend_end = (pd.to_datetime(date, format="%d/%m/%Y") for date in match.groups())
+    return weekend_start, weekend_end
+
+
+def split_consolidated_by_report(datasets: dict[str, pd.DataFrame]) -> dict[str, dict[str, pd.DataFrame]]:
+    """
+        Splits consolidated batch ingestion datasets (tagged with 'Report' and 'Source file' columns)
+        back into the run tables of each report, keyed by report heading.
+    """
+    frames_by_report = defaultdict(dict)
+    for table_name in RUN_TABLE_ATTRIBUTES:
+        df = datasets.get(table_name)
+        if df is None or df.empty:
+            continue
+        for report_heading, report_df in df.groupby("Report", sort=False, observed=True):
+            frames_by_report[report_heading][table_name] = report_df.drop(columns=["Report", "Source file"])
+    return dict(frames_by_report)
+
+
+class FilmRunStore:
+    """
+        Append-only store of the rows of many weekend reports, merged into one long table keyed by
+        report weekend, with an index from normalised film title (and distributor) to the rows of that film.
+    """
+    def __init__(self):
+        self._chunks = []
+        self._table = None
+        self._country_matrix = None
+        self._num_rows = 0
+        self._weekends = set()
+        # key -> sorted list of (weekend start, row position in the long table)
+        self._title_index = defaultdict(list)
+        self._title_distributor_index = defaultdict(list)
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    @property
+    def weekends(self) -> list[pd.Timestamp]:
+        return sorted(self._weekends)
+
+    def has_weekend(self, weekend_start: pd.Timestamp) -> bool:
+        return weekend_start in self._weekends
+
+    @property
+    def table(self) -> pd.DataFrame:
+        if self._table is None:
+            self._table = concat_typed(self._chunks, ignore_index=True) if self._chunks else pd.DataFrame()
+            self._chunks = [self._table] # later appends concatenate onto the consolidated table
+        return self._table
+
+    @property
+    def country_matrix(self) -> pd.DataFrame:
+        """
+            Multi-hot boolean matrix of the countries of origin of the table's rows, one column per country.
+        """
+        if self._country_matrix is None or len(self._country_matrix) != self._num_rows:
+            self._country_matrix = country_matrix(self.table["Country of Origin"]) if self._num_rows \
+                else pd.DataFrame()
+        return self._country_matrix
+
+    def append(self, report_heading: str, tables: dict[str, pd.DataFrame]) -> None:
+        """
+            Appends the run tables (top 15, other UK films, other new releases) of one report.
+            Raises ValueError if the report's weekend is already in the store.
+        """
+        weekend_start, weekend_end = parse_report_weekend(report_heading)
+        if weekend_start in self._weekends:
+            raise ValueError(f"The weekend of {weekend_start:%d/%m/%Y} is already in the store.")
+
+        frames = []
+        for table_name, df in tables.items():
+            df = df.copy()
+            df.insert(0, "Weekend start", weekend_start)
+            df.insert(1, "Weekend end", weekend_end)
+            df.insert(2, "Table", table_name)
+            frames.append(df)
+        chunk = concat_typed(frames, ignore_index=True)
+        chunk.insert(3, "Film key", chunk["Film"].map(normalise_key))
+        chunk.insert(4, "Distributor key", chunk["Distributor"].map(normalise_key))
+
+        for offset, (film_key, distributor_key) in enumerate(zip(chunk["Film key"], chunk["Distributor key"])):
+            entry = (weekend_start, self._num_rows + offset)
+            bisect.insort(self._title_index[film_key], entry)
+            bisect.insort(self._title_distributor_index[(film_key, distributor_key)], entry)
+
+        self._chunks.append(chunk)
+        self._table = None
+        self._num_rows += len(chunk)
+        self._weekends.add(weekend_start)
+
+    def append_report(self, report) -> None:
+        """
+            Appends a parsed report, i.e. an ExcelParser or a cached ParsedReport.
+        """
+        tables = {table_name: getattr(report, attribute) for table_name, attribute in RUN_TABLE_ATTRIBUTES.items()}
+        self.append(report.report_heading, tables)
+
+    def extend_from_consolidated(self, datasets: dict[str, pd.DataFrame]) -> list[str]:
+        """
+            Appends every report found in consolidated batch ingestion datasets (tagged with a 'Report' column),
+            skipping weekends already in the store. Returns the headings of the reports appended.
+        """
+        appended = []
+        for report_heading, tables in split_consolidated_by_report(datasets).items():
+            if self.has_weekend(parse_report_weekend(report_heading)[0]):
+                continue
+            self.append(report_heading, tables)
+            appended.append(report_heading)
+        return appended
+
+    def film_run(self, title: str, distributor: str = None) -> pd.DataFrame:
+        """
+            Returns every row of the given film across the stored weekends, in weekend order.
+        """
+        film_key = normalise_key(title)
+        if distributor is None:
+            entries = self._title_index.get(film_key, [])
+        else:
+            entries = self._title_distributor_index.get((film_key, normalise_key(distributor)), [])
+        return self.table.take([row for _, row in entries])
+
+    def titles(self) -> list[str]:
+        return sorted(self._title_index)
+
+    def save(self, path: str) -> None:
+        self.table.to_pickle(path)
+
+    @classmethod
+    def load(cls, path: str) -> "FilmRunStore":
+        store = cls()
+        table = pd.read_pickle(path)
+        for weekend_start, weekend_table in table.groupby("Weekend start", sort=True, observed=True):
+            store._add_loaded_chunk(weekend_start, weekend_table.reset_index(drop=True))
+        return store
+
+    def _add_loaded_chunk(self, weekend_start: pd.Timestamp, chunk: pd.DataFrame) -> None:
+        for offset, (film_key, distributor_key) in enumerate(zip(chunk["Film key"], chunk["Distributor key"])):
+            entry = (weekend_start, self._num_rows + offset)
+            self._title_index[film_key].append(entry)
+            self._title_distributor_index[(film_key, distributor_key)].append(entry)
+        self._chunks.append(chunk)
+        self._table = None
+        self._num_rows += len(chunk)
+        self._weekends.add(weekend_start)
@@ -0,0 +1,105 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# "Film (Distributor) - note"; the film title may itself end in brackets, e.g. "Coraline (15th Anniversary)"
+NOTE_PATTERN = re.compile(r"^(?P<film>.*?) \([^\)]+\) - (?P<note>.*)$", re.DOTALL)
+PREVIEWS_GROSS_PATTERN = re.compile(r"Includes £(?P<gross>[\d,]+) from (?P<previews>[\d,]+) previews?", re.IGNORECASE)
+FALL_OFF_WITHOUT_PREVIEWS_PATTERN = re.compile(r"Fall-off without previews is (?P<fall_off>-?[\d.]+)%", re.IGNORECASE)
+PREVIEW_DATE_PATTERN = re.compile(r"\b(\d{1,2}/\d{1,2}/\d{4})\b")
+
+NOTES_COLUMNS = ["Film", "Notes", "Preview gross", "Previews", "Fall-off without previews",
+                 "First preview date", "Last preview date"]
+
+
+def _to_int(digits: str) -> int:
+    return int(digits.replace(",", ""))
+
+
+class NotesParseResult:
+    def __init__(self, notes: pd.DataFrame, unmatched: list[dict]):
+        self.notes = notes
+        self.unmatched = unmatched # {"row": position among the notes, "note": text, "reason": why it was not parsed}
+
+
+def parse_note(note: str) -> dict | None:
+    """
+        Parses a single note into its film, note text, preview gross, number of previews, fall-off without
+        previews and preview dates (as written, dd/mm/yyyy), or returns None if it is not in the
+        'Film (Distributor) - note' layout. Fields the note does not mention are None.
+    """
+    match = NOTE_PATTERN.match(str(note))
+    if match is None:
+        return None
+    note_text = match.group("note")
+    parsed = {"film": match.group("film"), "note": note_text, "preview_gross": None, "previews": None,
+              "fall_off": None, "dates": []}
+    previews_match = PREVIEWS_GROSS_PATTERN.search(note_text)
+    if previews_match is not None:
+        parsed["preview_gross"] = _to_int(previews_match.group("gross"))
+        parsed["previews"] = _to_int(previews_match.group("previews"))
+    fall_off_match = FALL_OFF_WITHOUT_PREVIEWS_PATTERN.search(note_text)
+    if fall_off_match is not None:
+        parsed["fall_off"] = float(fall_off_match.group("fall_off")) / 100
+    if "preview" in note_text.lower():
+        parsed["dates"] = PREVIEW_DATE_PATTERN.findall(note_text)
+    return parsed
+
+
+def parse_notes(notes_list: list[str]) -> NotesParseResult:
+    """
+        Parses the notes on the top 15 table into one row per film, joining a film's notes with newlines
+        and extracting the preview gross, number of previews, fall-off without previews and preview dates
+        into their own columns. Notes not in the 'Film (Distributor) - note' layout are returned as
+        unmatched rather than raised, so one malformed note does not stop a backfill.
+    """
+    films = {} # film -> accumulated fields; dicts keep the order films are first noted in
+    unmatched = []
+    for row, note in enumerate(notes_list):
+        parsed = parse_note(note)
+        if parsed is None:
+            unmatched.append({"row": row, "note": note, "reason": "expected 'Film (Distributor) - note'"})
+            continue
+        fields = films.get(parsed["film"])
+        if fields is None:
+            fields = films[parsed["film"]] = {"notes": [], "preview_gross": None, "previews": None, "fall_off": None,
+                                              "dates": []}
+        fields["notes"].append(parsed["note"])
+        if parsed["preview_gross"] is not None:
+            fields["preview_gross"] = (fields["preview_gross"] or 0) + parsed["preview_gross"]
+            fields["previews"] = (fields["previews"] or 0) + parsed["previews"]
+        if parsed["fall_off"] is not None:
+            fields["fall_off"] = parsed["fall_off"]
+        fields["dates"].extend(parsed["dates"])
+
+    # every preview date is converted in one go, then reduced to each film's first and last
+    film_positions = {film: position for position, film in enumerate(films)}
+    dated_films = [film_positions[film] for film, fields in films.items() for _ in fields["dates"]]
+    preview_dates = pd.Series(pd.to_datetime([date for fields in films.values() for date in fields["dates"]],
+                                             format="%d/%m/%Y", errors="coerce"), index=dated_films, dtype="datetime64[ns]")
+    preview_dates = preview_dates.groupby(level=0).agg(["min", "max"]).reindex(range(len(films)))
+
+    notes = pd.DataFrame({
+        "Film": np.array(list(films), dtype=object),
+        "Notes": np.array(["\n".join(fields["notes"]) for fields in films.values()], dtype=object),
+        "Preview gross": pd.array([fields["preview_gross"] for fields in films.values()], dtype="Int64"),
+        "Previews": pd.array([fields["previews"] for fields in films.values()], dtype="Int64"),
+        "Fall-off without previews": np.array([np.nan if fields["fall_off"] is None else fields["fall_off"]
+                                               for fields in films.values()], dtype=float),
+        "First preview date": preview_dates["min"].to_numpy(dtype="datetime64[ns]"),
+        "Last preview date": preview_dates["max"].to_numpy(dtype="datetime64[ns]"),
+    }, columns=NOTES_COLUMNS)
+    return NotesParseResult(notes, unmatched)
+
+
+def join_notes_column(top_15_df: pd.DataFrame, notes: pd.DataFrame) -> pd.DataFrame:
+    """
+        Adds the 'Notes' column to the top 15 by looking each film up in a dict of its notes,
+        equivalent to a left merge on 'Film' with at most one note row per film.
+    """
+    notes_by_film = dict(zip(notes["Film"], notes["Notes"]))
+    joined = top_15_df.copy()
+    joined["Notes"] = joined["Film"].map(notes_by_film)
+    return joined
@@ -0,0 +1,90 @@
+import contextlib
+import logging
+import time
+import tracemalloc
+from typing import Callable
+
+import pandas as pd
+
+from utils.sheet_scanner import SheetScanner
+
+
+logger = logging.getLogger(__name__)
+
+
+def rows_scanned(step_result) -> int:
+    """
+        Number of sheet rows a parsing step produced or went through, judged from its result.
+    """
+    if isinstance(step_result, SheetScanner): # reads every row of the sheet
+        return step_result.nrows
+    if isinstance(step_result, (pd.DataFrame, list)):
+        return len(step_result)
+    return 0
+
+
+class ParserInstrumentation:
+    """
+        Opt-in recorder of the wall time, rows scanned and peak memory allocated by each ExcelParser step.
+        Every step's metrics are kept in `records`, logged through this module's logger,
+        and passed to `sink` if one is given, e.g. to forward them to a metrics system.
+    """
+    def __init__(self, sink: Callable[[dict], None] = None, log_level: int = logging.INFO, track_memory: bool = True):
+        self.sink = sink
+        self.log_level = log_level
+        self.track_memory = track_memory
+        self.records = []
+
+    @contextlib.contextmanager
+    def parse_session(self):
+        """
+            Wraps a whole parse, tracing memory allocations for its duration if they are tracked
+            and nothing else is already tracing them.
+        """
+        started_tracing = self.track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+    def run_step(self, excel_report_filepath: str, step_name: str, step: Callable):
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            memory_at_start = tracemalloc.get_traced_memory()[0]
+        else:
+            memory_at_start = None
+        error = None
+        result = None
+        start = time.perf_counter()
+        try:
+            result = step()
+            return result
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record = {
+                "report": excel_report_filepath,
+                "step": step_name,
+                "wall_seconds": time.perf_counter() - start,
+                "rows_scanned": rows_scanned(result),
+                "peak_allocated_bytes": tracemalloc.get_traced_memory()[1] - memory_at_start
+                                        if memory_at_start is not None else None,
+                "error": error,
+            }
+            self._emit(record)
+
+    def _emit(self, record: dict) -> None:
+        self.records.append(record)
+        peak = f"{record['peak_allocated_bytes'] / 1024:.1f} KiB" if record["peak_allocated_bytes"] is not None else "n/a"
+        logger.log(self.log_level, "%s %s: %.2f ms, %d rows, peak %s%s", record["report"], record["step"],
+                   record["wall_seconds"] * 1000, record["rows_scanned"], peak,
+                   f", failed with {record['error']}" if record["error"] else "")
+        if self.sink is not None:
+            self.sink(record)
+
+    def summary(self) -> pd.DataFrame:
+        return pd.DataFrame(self.records)
@@ -0,0 +1,229 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from utils.film_run_store import (RUN_TABLE_ATTRIBUTES, normalise_key, parse_report_weekend,
+                                  split_consolidated_by_report)
+from utils.report_schema import concat_typed, country_matrix
+
+
+# Aggregate name -> columns of its table, after "Weekend start"
+AGGREGATE_COLUMNS = {
+    "weekend_totals": ["Weekend end", "Top 15 weekend gross", "Reported weekend gross", "Films reported", "New releases"],
+    "distributor_share": ["Distributor", "Weekend Gross", "Films", "Share of weekend gross"],
+    "country_share": ["Country", "Weekend Gross", "Films", "Share of weekend gross"],
+    "uk_top_15_share": ["Top 15 weekend gross", "UK weekend gross", "UK films", "UK share of top 15 gross"],
+    "film_decay": ["Film key", "Film", "Distributor", "Weeks on release", "Weekend Gross", "% change on last week"],
+}
+ROLLING_COLUMNS = ["Top 15 weekend gross", "Reported weekend gross", "Films reported", "New releases"]
+
+
+def _reported_films(tables: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+        Combines a report's run tables into one row per ranked film. A film can be listed both as
+        another UK film and as another new release, so duplicate ranks are dropped, keeping the first.
+    """
+    frames = [tables[table_name].assign(Table=table_name) for table_name in RUN_TABLE_ATTRIBUTES
+              if table_name in tables and not tables[table_name].empty]
+    films = concat_typed(frames, ignore_index=True)
+    return films.drop_duplicates(subset="Rank", keep="first").reset_index(drop=True)
+
+
+def _share_by(films: pd.DataFrame, column: str, reported_gross: int) -> pd.DataFrame:
+    grouped = films.groupby(column, sort=False, observed=True)["Weekend Gross"].agg(["sum", "size"])
+    share = pd.DataFrame({
+        column: grouped.index,
+        "Weekend Gross": grouped["sum"].to_numpy(),
+        "Films": grouped["size"].to_numpy(),
+    })
+    share["Share of weekend gross"] = share["Weekend Gross"] / reported_gross if reported_gross else float("nan")
+    return share.sort_values("Weekend Gross", ascending=False, ignore_index=True)
+
+
+def compute_weekend_aggregates(report_heading: str, tables: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
+    """
+        Computes every aggregate of a single report from its run tables (top 15, other UK films,
+        other new releases). Shares are of the gross of the films the report lists, since the
+        report does not give the gross of the films outside those tables.
+    """
+    weekend_start, weekend_end = parse_report_weekend(report_heading)
+    films = _reported_films(tables)
+    top_15 = films[films["Table"] == "top_15"]
+    reported_gross = int(films["Weekend Gross"].sum())
+    top_15_gross = int(top_15["Weekend Gross"].sum())
+
+    countries = country_matrix(films["Country of Origin"])
+    # a co-production counts towards each of its countries, so country shares can add up to more than 1
+    country_share = pd.DataFrame({
+        "Country": countries.columns,
+        "Weekend Gross": countries.to_numpy().T.astype(np.int64) @ films["Weekend Gross"].to_numpy(np.int64),
+        "Films": countries.sum().to_numpy(),
+    })
+    country_share["Share of weekend gross"] = country_share["Weekend Gross"] / reported_gross if reported_gross \
+        else float("nan")
+    country_share = country_share.sort_values("Weekend Gross", ascending=False, kind="stable", ignore_index=True)
+
+    uk_in_countries = countries["UK"] if "UK" in countries.columns else pd.Series(False, index=films.index)
+    uk_top_15 = top_15[uk_in_countries[top_15.index]]
+    uk_top_15_gross = int(uk_top_15["Weekend Gross"].sum())
+
+    aggregates = {
+        "weekend_totals": pd.DataFrame({
+            "Weekend end": [weekend_end],
+            "Top 15 weekend gross": [top_15_gross],
+            "Reported weekend gross": [reported_gross],
+            "Films reported": [len(films)],
+            "New releases": [int((films["Weeks on release"] == 1).sum())],
+        }),
+        "distributor_share": _share_by(films, "Distributor", reported_gross),
+        "country_share": country_share,
+        "uk_top_15_share": pd.DataFrame({
+            "Top 15 weekend gross": [top_15_gross],
+            "UK weekend gross": [uk_top_15_gross],
+            "UK films": [len(uk_top_15)],
+            "UK share of top 15 gross": [uk_top_15_gross / top_15_gross if top_15_gross else float("nan")],
+        }),
+        "film_decay": films.assign(**{"Film key": films["Film"].map(normalise_key)})[AGGREGATE_COLUMNS["film_decay"]],
+    }
+    for aggregate_name, df in aggregates.items():
+        df.insert(0, "Weekend start", weekend_start)
+    return aggregates
+
+
+class ReportAnalytics:
+    """
+        Cross-week aggregates of many weekend reports: distributor and country-of-origin shares of the
+        weekend gross, the UK share of the top 15, weekend totals and per-film week-over-week decay.
+        Each report's aggregates are computed once, when it is ingested, and the multi-week tables
+        are only concatenated again after the set of weekends changes.
+    """
+    def __init__(self):
+        # (weekend start -> aggregate name -> that weekend's rows, cache of concatenated tables)
+        # swapped in as one tuple, so readers on other threads never mix an old cache with new weekends
+        self._state = ({}, {})
+
+    @property
+    def weekends(self) -> list[pd.Timestamp]:
+        return sorted(self._state[0])
+
+    def has_weekend(self, weekend_start: pd.Timestamp) -> bool:
+        return weekend_start in self._state[0]
+
+    def ingest(self, report_heading: str, tables: dict[str, pd.DataFrame]) -> pd.Timestamp:
+        """
+            Computes and stores the aggregates of one report, replacing those of the same weekend if present.
+        """
+        aggregates = compute_weekend_aggregates(report_heading, tables)
+        weekend_start = aggregates["weekend_totals"]["Weekend start"].iloc[0]
+        weekly = dict(self._state[0])
+        weekly[weekend_start] = aggregates
+        self._state = (weekly, {})
+        return weekend_start
+
+    def ingest_report(self, report) -> pd.Timestamp:
+        """
+            Ingests a parsed report, i.e. an ExcelParser or a cached ParsedReport.
+        """
+        tables = {table_name: getattr(report, attribute) for table_name, attribute in RUN_TABLE_ATTRIBUTES.items()}
+        return self.ingest(report.report_heading, tables)
+
+    def extend_from_consolidated(self, datasets: dict[str, pd.DataFrame]) -> list[str]:
+        """
+            Ingests every report found in consolidated batch ingestion datasets, skipping weekends
+            already ingested. Returns the headings of the reports ingested.
+        """
+        ingested = []
+        for report_heading, tables in split_consolidated_by_report(datasets).items():
+            if self.has_weekend(parse_report_weekend(report_heading)[0]):
+                continue
+            self.ingest(report_heading, tables)
+            ingested.append(report_heading)
+        return ingested
+
+    @classmethod
+    def from_store(cls, store) -> "ReportAnalytics":
+        """
+            Builds the aggregates of every weekend in a FilmRunStore.
+        """
+        analytics = cls()
+        table = store.table
+        if table.empty:
+            return analytics
+        for (weekend_start, weekend_end), weekend_table in table.groupby(["Weekend start", "Weekend end"], sort=True, observed=True):
+            report_heading = f"{weekend_start:%d/%m/%Y} - {weekend_end:%d/%m/%Y}"
+            tables = {table_name: df.drop(columns=["Weekend start", "Weekend end", "Table", "Film key", "Distributor key"])
+                      for table_name, df in weekend_table.groupby("Table", sort=False, observed=True)}
+            analytics.ingest(report_heading, tables)
+        return analytics
+
+    def remove_weekend(self, weekend_start: pd.Timestamp) -> None:
+        weekly = {weekend: aggregates for weekend, aggregates in self._state[0].items() if weekend != weekend_start}
+        self._state = (weekly, {})
+
+    def _table(self, aggregate_name: str) -> pd.DataFrame:
+        weekly, cache = self._state
+        if aggregate_name not in cache:
+            frames = [weekly[weekend_start][aggregate_name] for weekend_start in sorted(weekly)]
+            cache[aggregate_name] = concat_typed(frames, ignore_index=True) if frames else \
+                pd.DataFrame(columns=["Weekend start"] + AGGREGATE_COLUMNS[aggregate_name])
+        return cache[aggregate_name]
+
+    @staticmethod
+    def _between(df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df["Weekend start"] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= df["Weekend start"] <= pd.Timestamp(end)
+        return df[mask]
+
+    def weekend_totals(self, start=None, end=None) -> pd.DataFrame:
+        return self._between(self._table("weekend_totals"), start, end)
+
+    def rolling_totals(self, window: int = 4, start=None, end=None) -> pd.DataFrame:
+        """
+            Mean of each weekend total over the given number of ingested weekends up to and including each weekend.
+        """
+        totals = self._table("weekend_totals")
+        rolling = totals[ROLLING_COLUMNS].rolling(window, min_periods=1).mean()
+        return self._between(pd.concat([totals[["Weekend start", "Weekend end"]], rolling], axis=1), start, end)
+
+    def distributor_share(self, start=None, end=None) -> pd.DataFrame:
+        return self._between(self._table("distributor_share"), start, end)
+
+    def country_share(self, start=None, end=None) -> pd.DataFrame:
+        return self._between(self._table("country_share"), start, end)
+
+    def uk_top_15_share(self, start=None, end=None) -> pd.DataFrame:
+        return self._between(self._table("uk_top_15_share"), start, end)
+
+    def decay_curve(self, title: str, distributor: str = None) -> pd.DataFrame:
+        """
+            Returns the weekends of a film in order, with its gross as a fraction of its opening weekend
+            when the opening weekend has been ingested.
+        """
+        film_decay = self._table("film_decay")
+        cache = self._state[1]
+        if "film_decay_index" not in cache:
+            cache["film_decay_index"] = film_decay.groupby("Film key", observed=True).indices if not film_decay.empty else {}
+        positions = cache["film_decay_index"].get(normalise_key(title), [])
+        curve = film_decay.take(positions)
+        if distributor is not None:
+            curve = curve[curve["Distributor"].map(normalise_key) == normalise_key(distributor)]
+        curve = curve.sort_values("Weekend start", ignore_index=True)
+        opening_gross = curve.loc[curve["Weeks on release"] == 1, "Weekend Gross"]
+        curve["Gross vs opening weekend"] = curve["Weekend Gross"] / opening_gross.iloc[0] \
+            if not opening_gross.empty else float("nan")
+        return curve
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            pickle.dump(self._state[0], f)
+
+    @classmethod
+    def load(cls, path: str) -> "ReportAnalytics":
+        analytics = cls()
+        with open(path, "rb") as f:
+            analytics._state = (pickle.load(f), {})
+        return analytics
@@ -0,0 +1,184 @@
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from utils.excel_parser import ExcelParser, PARSER_VERSION
+from utils.parser_instrumentation import ParserInstrumentation
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bfi-weekend-box-office")
+DEFAULT_MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+DATAFRAME_ATTRIBUTES = [
+    "top_15_df",
+    "other_uk_films_df",
+    "other_new_releases_df",
+    "notes_on_top_15_table_df",
+    "top_15_df_with_notes_column",
+    "openers_next_week_df",
+]
+METADATA_ATTRIBUTES = [
+    "report_heading",
+    "column_names",
+    "total_top_15_weekend_gross",
+    "total_top_15_gross_to_date",
+    "list_of_comments_on_top_15_result",
+    "unmatched_notes_on_top_15",
+]
+
+# Parquet needs pyarrow, which is not part of the base environment
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+class ParsedReport:
+    """
+        Holds the parsed datasets of a report under the same attribute names as ExcelParser,
+        without keeping the xlrd workbook around.
+    """
+    def __init__(self, **attributes):
+        for attribute in DATAFRAME_ATTRIBUTES + METADATA_ATTRIBUTES:
+            setattr(self, attribute, attributes[attribute])
+
+    @classmethod
+    def from_excel_parser(cls, excel_parser: ExcelParser) -> "ParsedReport":
+        return cls(**{attribute: getattr(excel_parser, attribute)
+                      for attribute in DATAFRAME_ATTRIBUTES + METADATA_ATTRIBUTES})
+
+
+def hash_report_file(excel_report_filepath: str) -> str:
+    digest = hashlib.sha256()
+    with open(excel_report_filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digest.update(f"parser-v{PARSER_VERSION}".encode())
+    return digest.hexdigest()
+
+
+class ReportCache:
+    """
+        On-disk cache of parsed reports, keyed by a hash of the source file's content plus the parser version.
+        Each entry is a directory holding one Parquet (or pickle, without pyarrow) file per dataset
+        and a json file for the heading, totals and comments. Least recently used entries are evicted
+        once the cache grows beyond max_bytes.
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.dataset_format = "parquet" if PARQUET_AVAILABLE else "pickle"
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, excel_report_filepath: str) -> ParsedReport | None:
+        entry_dir = self._entry_dir(hash_report_file(excel_report_filepath))
+        metadata_path = os.path.join(entry_dir, "metadata.json")
+        if not os.path.exists(metadata_path):
+            return None
+        try:
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            attributes = dict(metadata["attributes"])
+            for attribute in DATAFRAME_ATTRIBUTES:
+                attributes[attribute] = self._read_dataset(entry_dir, attribute, metadata["format"])
+        except (OSError, ValueError, KeyError, ImportError):
+            # a corrupt or partially removed entry is treated as a miss and rebuilt
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        os.utime(entry_dir) # recency for LRU eviction
+        return ParsedReport(**attributes)
+
+    def put(self, excel_report_filepath: str, report) -> None:
+        entry_dir = self._entry_dir(hash_report_file(excel_report_filepath))
+        staging_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".staging-")
+        try:
+            for attribute in DATAFRAME_ATTRIBUTES:
+                self._write_dataset(staging_dir, attribute, getattr(report, attribute))
+            metadata = {
+                "source_file": os.path.abspath(excel_report_filepath),
+                "parser_version": PARSER_VERSION,
+                "format": self.dataset_format,
+                "attributes": {attribute: getattr(report, attribute) for attribute in METADATA_ATTRIBUTES},
+            }
+            with open(os.path.join(staging_dir, "metadata.json"), "w") as f:
+                json.dump(metadata, f)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging_dir, entry_dir) # entries only ever appear complete
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        self._evict()
+
+    def load(self, excel_report_filepath: str, instrumentation: ParserInstrumentation = None) -> ParsedReport:
+        """
+            Returns the cached parse of the report, parsing it with ExcelParser and caching it on a miss.
+            Caching is best-effort: if the parse cannot be written to the cache, it is still returned.
+        """
+        report = self.get(excel_report_filepath)
+        if report is None:
+            report = ParsedReport.from_excel_parser(ExcelParser(excel_report_filepath, instrumentation))
+            try:
+                self.put(excel_report_filepath, report)
+            except (OSError, ValueError, TypeError):
+                # e.g. a full disk, or a column pyarrow cannot write; the parse is still good, it is just not cached
+                logger.warning("Could not cache the parse of %s.", excel_report_filepath, exc_info=True)
+        return report
+
+    def invalidate(self, excel_report_filepath: str = None) -> int:
+        """
+            Removes the entry for the given report, or every entry if no report is given.
+            Returns the number of entries removed.
+        """
+        if excel_report_filepath is not None:
+            entry_dirs = [self._entry_dir(hash_report_file(excel_report_filepath))]
+        else:
+            entry_dirs = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_dir()]
+        removed = 0
+        for entry_dir in entry_dirs:
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def entries(self) -> list[dict]:
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            entries.append({"key": entry.name, "path": entry.path, "bytes": size,
+                            "last_used": entry.stat().st_mtime})
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self.entries(), key=lambda entry: entry["last_used"])
+        total_bytes = sum(entry["bytes"] for entry in entries)
+        while entries and total_bytes > self.max_bytes:
+            oldest = entries.pop(0)
+            shutil.rmtree(oldest["path"], ignore_errors=True)
+            total_bytes -= oldest["bytes"]
+
+    def _write_dataset(self, entry_dir: str, name: str, df: pd.DataFrame) -> None:
+        if self.dataset_format == "parquet":
+            df.to_parquet(os.path.join(entry_dir, f"{name}.parquet"), index=False)
+        else:
+            df.to_pickle(os.path.join(entry_dir, f"{name}.pkl"))
+
+    @staticmethod
+    def _read_dataset(entry_dir: str, name: str, dataset_format: str) -> pd.DataFrame:
+        if dataset_format == "parquet":
+            return pd.read_parquet(os.path.join(entry_dir, f"{name}.parquet"))
+        return pd.read_pickle(os.path.join(entry_dir, f"{name}.pkl"))
+
+
+def format_cache_entry(entry: dict) -> str:
+    last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["last_used"]))
+    return f"{entry['key'][:16]}  {entry['bytes'] / 1024:8.1f} KiB  last used {last_used}"
@@ -0,0 +1,372 @@
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from utils.batch_ingestion import DATASET_ATTRIBUTES
+from utils.film_run_store import RUN_TABLE_ATTRIBUTES, normalise_key, parse_report_weekend
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weekends (
+    weekend_id INTEGER PRIMARY KEY,
+    weekend_start TEXT NOT NULL UNIQUE,
+    weekend_end TEXT NOT NULL,
+    report_heading TEXT NOT NULL,
+    source_file TEXT,
+    top_15_weekend_gross INTEGER,
+    top_15_gross_to_date INTEGER
+);
+CREATE TABLE IF NOT EXISTS distributors (
+    distributor_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS films (
+    film_id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    title_key TEXT NOT NULL,
+    distributor_id INTEGER NOT NULL REFERENCES distributors (distributor_id),
+    country_of_origin TEXT,
+    UNIQUE (title_key, distributor_id)
+);
+CREATE TABLE IF NOT EXISTS film_countries (
+    film_id INTEGER NOT NULL REFERENCES films (film_id),
+    country TEXT NOT NULL,
+    PRIMARY KEY (film_id, country)
+);
+CREATE TABLE IF NOT EXISTS weekend_entries (
+    weekend_id INTEGER NOT NULL REFERENCES weekends (weekend_id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    film_id INTEGER NOT NULL REFERENCES films (film_id),
+    rank INTEGER,
+    weekend_gross INTEGER,
+    change_on_last_week REAL,
+    weeks_on_release INTEGER,
+    number_of_cinemas INTEGER,
+    site_average INTEGER,
+    total_gross_to_date INTEGER,
+    PRIMARY KEY (weekend_id, table_name, position)
+);
+CREATE TABLE IF NOT EXISTS notes (
+    weekend_id INTEGER NOT NULL REFERENCES weekends (weekend_id) ON DELETE CASCADE,
+    film_id INTEGER REFERENCES films (film_id),
+    film TEXT NOT NULL,
+    note TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    weekend_id INTEGER NOT NULL REFERENCES weekends (weekend_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    comment TEXT NOT NULL,
+    PRIMARY KEY (weekend_id, position)
+);
+CREATE TABLE IF NOT EXISTS openers (
+    weekend_id INTEGER NOT NULL REFERENCES weekends (weekend_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    film TEXT NOT NULL,
+    country_of_origin TEXT,
+    distributor TEXT,
+    PRIMARY KEY (weekend_id, position)
+);
+CREATE INDEX IF NOT EXISTS films_distributor ON films (distributor_id);
+CREATE INDEX IF NOT EXISTS film_countries_country ON film_countries (country);
+CREATE INDEX IF NOT EXISTS weekend_entries_film ON weekend_entries (film_id, weekend_id);
+CREATE INDEX IF NOT EXISTS notes_weekend_film ON notes (weekend_id, film_id);
+"""
+
+# Titles, distributor names and weekend dates are indexed by the UNIQUE constraints on
+# films (title_key, distributor_id), distributors (name_key) and weekends (weekend_start)
+
+# sqlite limits the number of parameters bound to one statement
+MAX_QUERY_PARAMETERS = 900
+
+# weekend_entries column -> column of the parsed run tables
+ENTRY_COLUMNS = {
+    "rank": "Rank",
+    "weekend_gross": "Weekend Gross",
+    "change_on_last_week": "% change on last week",
+    "weeks_on_release": "Weeks on release",
+    "number_of_cinemas": "Number of cinemas",
+    "site_average": "Site average",
+    "total_gross_to_date": "Total Gross to date",
+}
+
+ENTRIES_QUERY = f"""
+SELECT w.weekend_start AS "Weekend start", w.weekend_end AS "Weekend end", e.table_name AS "Table",
+       e.rank AS "Rank", f.title AS "Film", f.country_of_origin AS "Country of Origin",
+       e.weekend_gross AS "Weekend Gross", d.name AS "Distributor",
+       {", ".join(f'e.{column} AS "{name}"' for column, name in ENTRY_COLUMNS.items() if column not in ("rank", "weekend_gross"))},
+       n.note AS "Notes"
+FROM weekend_entries e
+JOIN weekends w ON w.weekend_id = e.weekend_id
+JOIN films f ON f.film_id = e.film_id
+JOIN distributors d ON d.distributor_id = f.distributor_id
+LEFT JOIN notes n ON n.weekend_id = e.weekend_id AND n.film_id = e.film_id AND e.table_name = 'top_15'
+"""
+# sorts entries into the order of the run tables in RUN_TABLE_ATTRIBUTES
+TABLE_ORDER = "CASE e.table_name {} END".format(" ".join(f"WHEN '{table_name}' THEN {position}"
+                                                         for position, table_name in enumerate(RUN_TABLE_ATTRIBUTES)))
+# the run table column order, with the weekend columns in front
+ENTRIES_COLUMN_ORDER = ["Weekend start", "Weekend end", "Table", "Rank", "Film", "Country of Origin", "Weekend Gross",
+                        "Distributor", "% change on last week", "Weeks on release", "Number of cinemas",
+                        "Site average", "Total Gross to date", "Notes"]
+
+
+def _sql_value(value):
+    """
+        Converts pandas/numpy scalars into values sqlite3 can bind, with NaN as NULL.
+    """
+    if value is None or (isinstance(value, float) and value != value) or value is pd.NA:
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def _date_text(timestamp: pd.Timestamp) -> str:
+    return f"{pd.Timestamp(timestamp):%Y-%m-%d}"
+
+
+class ReportDatabase:
+    """
+        Embedded SQLite archive of parsed reports, normalised into weekends, distributors, films
+        (with their countries of origin), weekend entries, notes, comments and openers.
+        Each report is written in a single transaction, and queries read only the weekends and films asked for.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local() # sqlite3 connections cannot be shared between threads
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA foreign_keys = ON")
+            connection.execute("PRAGMA journal_mode = WAL") # readers are not blocked while a report is ingested
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _upsert_distributors(self, names) -> dict[str, int]:
+        by_key = {normalise_key(name): name for name in names}
+        self.connection.executemany("INSERT OR IGNORE INTO distributors (name, name_key) VALUES (?, ?)",
+                                    [(name, key) for key, name in by_key.items()])
+        return self._ids("SELECT name_key, distributor_id FROM distributors WHERE name_key IN ({})", list(by_key))
+
+    def _upsert_films(self, films: pd.DataFrame, distributor_ids: dict[str, int]) -> dict[tuple, int]:
+        rows = {}
+        for title, country, distributor in zip(films["Film"], films["Country of Origin"], films["Distributor"]):
+            key = (normalise_key(title), distributor_ids[normalise_key(distributor)])
+            rows[key] = (title, key[0], key[1], _sql_value(country))
+        self.connection.executemany("INSERT OR IGNORE INTO films (title, title_key, distributor_id, country_of_origin) \
+                                     VALUES (?, ?, ?, ?)", list(rows.values()))
+        # the latest report's spelling of the country of origin wins
+        self.connection.executemany("UPDATE films SET country_of_origin = ? WHERE title_key = ? AND distributor_id = ?",
+                                    [(row[3], row[1], row[2]) for row in rows.values()])
+        film_ids = self._ids("SELECT title_key, distributor_id, film_id FROM films WHERE title_key IN ({})",
+                             list({key[0] for key in rows}))
+        self.connection.executemany("INSERT OR IGNORE INTO film_countries (film_id, country) VALUES (?, ?)",
+                                    [(film_ids[key], country.strip()) for key, row in rows.items() if row[3]
+                                     for country in str(row[3]).split("/") if country.strip()])
+        return film_ids
+
+    def _ids(self, query: str, keys: list) -> dict:
+        """
+            Runs a query selecting (key..., id) rows for the given keys, binding at most MAX_QUERY_PARAMETERS at a time,
+            and returns them as a mapping from key (a tuple if there are several key columns) to id.
+        """
+        ids = {}
+        for offset in range(0, len(keys), MAX_QUERY_PARAMETERS):
+            batch = keys[offset:offset + MAX_QUERY_PARAMETERS]
+            for *key, row_id in self.connection.execute(query.format(", ".join("?" * len(batch))), batch):
+                ids[key[0] if len(key) == 1 else tuple(key)] = row_id
+        return ids
+
+    def ingest(self, report_heading: str, datasets: dict[str, pd.DataFrame], source_file: str = None,
+               top_15_weekend_gross=None, top_15_gross_to_date=None, comments: list[str] = ()) -> pd.Timestamp:
+        """
+            Writes one report in a single transaction, replacing the report of the same weekend if there is one.
+            `datasets` is keyed like the consolidated batch ingestion datasets (top_15, other_uk_films,
+            other_new_releases, notes, openers_next_week); missing datasets are stored as empty.
+        """
+        weekend_start, weekend_end = parse_report_weekend(report_heading)
+        run_tables = {table_name: datasets[table_name] for table_name in RUN_TABLE_ATTRIBUTES
+                      if datasets.get(table_name) is not None and not datasets[table_name].empty}
+        films = pd.concat(run_tables.values(), ignore_index=True) if run_tables else pd.DataFrame(
+            columns=["Film", "Country of Origin", "Distributor"])
+
+        with self.connection:
+            self.connection.execute("DELETE FROM weekends WHERE weekend_start = ?", (_date_text(weekend_start),))
+            weekend_id = self.connection.execute(
+                "INSERT INTO weekends (weekend_start, weekend_end, report_heading, source_file, top_15_weekend_gross, \
+                 top_15_gross_to_date) VALUES (?, ?, ?, ?, ?, ?)",
+                (_date_text(weekend_start), _date_text(weekend_end), report_heading, source_file,
+                 _sql_value(top_15_weekend_gross), _sql_value(top_15_gross_to_date))).lastrowid
+
+            distributor_ids = self._upsert_distributors(films["Distributor"].unique())
+            film_ids = self._upsert_films(films, distributor_ids)
+
+            entries = []
+            for table_name, df in run_tables.items():
+                keys = zip(df["Film"].map(normalise_key), df["Distributor"].map(normalise_key).map(distributor_ids))
+                values = zip(*(df[column] for column in ENTRY_COLUMNS.values()))
+                entries.extend((weekend_id, table_name, position, film_ids[key], *map(_sql_value, row))
+                               for position, (key, row) in enumerate(zip(keys, values)))
+            self.connection.executemany(f"INSERT INTO weekend_entries (weekend_id, table_name, position, film_id, \
+                                         {', '.join(ENTRY_COLUMNS)}) VALUES ({', '.join('?' * (4 + len(ENTRY_COLUMNS)))})",
+                                        entries)
+
+            notes = datasets.get("notes")
+            if notes is not None and not notes.empty:
+                # notes name the film only, so they are matched to the film of that title in this weekend's top 15
+                top_15 = run_tables.get("top_15", pd.DataFrame(columns=["Film", "Distributor"]))
+                top_15_film_ids = {normalise_key(title): film_ids[(normalise_key(title), distributor_ids[normalise_key(distributor)])]
+                                   for title, distributor in zip(top_15["Film"], top_15["Distributor"])}
+                self.connection.executemany("INSERT INTO notes (weekend_id, film_id, film, note) VALUES (?, ?, ?, ?)",
+                                            [(weekend_id, top_15_film_ids.get(normalise_key(film)), film, note)
+                                             for film, note in zip(notes["Film"], notes["Notes"])])
+
+            self.connection.executemany("INSERT INTO comments (weekend_id, position, comment) VALUES (?, ?, ?)",
+                                        [(weekend_id, position, comment) for position, comment in enumerate(comments)])
+
+            openers = datasets.get("openers_next_week")
+            if openers is not None and not openers.empty:
+                self.connection.executemany(
+                    "INSERT INTO openers (weekend_id, position, film, country_of_origin, distributor) VALUES (?, ?, ?, ?, ?)",
+                    [(weekend_id, position, film, _sql_value(country), _sql_value(distributor))
+                     for position, (film, country, distributor) in enumerate(zip(openers["Film"],
+                                                                                 openers["Country of Origin"],
+                                                                                 openers["Distributor"]))])
+        return weekend_start
+
+    def ingest_report(self, report, source_file: str = None) -> pd.Timestamp:
+        """
+            Writes a parsed report, i.e. an ExcelParser or a cached ParsedReport.
+        """
+        datasets = {dataset_name: getattr(report, attribute) for dataset_name, attribute in DATASET_ATTRIBUTES.items()}
+        return self.ingest(report.report_heading, datasets, source_file,
+                           report.total_top_15_weekend_gross, report.total_top_15_gross_to_date,
+                           report.list_of_comments_on_top_15_result)
+
+    def extend_from_consolidated(self, datasets: dict[str, pd.DataFrame], report_details: dict[str, dict] = None) -> list[str]:
+        """
+            Writes every report found in consolidated batch ingestion datasets, skipping weekends already stored.
+            The totals and comments are not part of those datasets; they are taken from `report_details`,
+            i.e. BatchIngestionResult.report_details, and left empty for a report it does not cover.
+            Returns the headings of the reports written.
+        """
+        frames_by_report = defaultdict(dict)
+        source_files = {}
+        for dataset_name in DATASET_ATTRIBUTES:
+            df = datasets.get(dataset_name)
+            if df is None or df.empty:
+                continue
+            for report_heading, report_df in df.groupby("Report", sort=False, observed=True):
+                source_files[report_heading] = report_df["Source file"].iloc[0]
+                frames_by_report[report_heading][dataset_name] = report_df.drop(columns=["Report", "Source file"])
+        stored = set(self.weekends())
+        ingested = []
+        for report_heading, report_datasets in frames_by_report.items():
+            if parse_report_weekend(report_heading)[0] in stored:
+                continue
+            details = (report_details or {}).get(report_heading) or {}
+            self.ingest(report_heading, report_datasets, source_files[report_heading],
+                        details.get("top_15_weekend_gross"), details.get("top_15_gross_to_date"),
+                        details.get("comments", ()))
+            ingested.append(report_heading)
+        return ingested
+
+    def delete_weekend(self, weekend_start: pd.Timestamp) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM weekends WHERE weekend_start = ?", (_date_text(weekend_start),))
+
+    def weekends(self) -> list[pd.Timestamp]:
+        return [pd.Timestamp(weekend_start) for (weekend_start,) in
+                self.connection.execute("SELECT weekend_start FROM weekends ORDER BY weekend_start")]
+
+    def _query(self, query: str, parameters: list = ()) -> pd.DataFrame:
+        df = pd.read_sql_query(query, self.connection, params=list(parameters))
+        for column in ("Weekend start", "Weekend end"):
+            if column in df:
+                df[column] = pd.to_datetime(df[column])
+        return df
+
+    @staticmethod
+    def _weekend_conditions(start=None, end=None) -> tuple[list[str], list]:
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append("w.weekend_start >= ?")
+            parameters.append(_date_text(start))
+        if end is not None:
+            conditions.append("w.weekend_start <= ?")
+            parameters.append(_date_text(end))
+        return conditions, parameters
+
+    def _entries(self, conditions: list[str], parameters: list) -> pd.DataFrame:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        df = self._query(f"{ENTRIES_QUERY} {where} ORDER BY w.weekend_start, {TABLE_ORDER}, e.position",
+                         parameters)
+        return df[ENTRIES_COLUMN_ORDER]
+
+    def weekend_entries(self, table_names: list[str] = None, start=None, end=None) -> pd.DataFrame:
+        """
+            The rows of the given run tables (all by default) for the weekends starting within [start, end],
+            with the same columns as the parsed tables plus the weekend and table they came from.
+        """
+        conditions, parameters = self._weekend_conditions(start, end)
+        if table_names is not None:
+            conditions.append(f"e.table_name IN ({', '.join('?' * len(table_names))})")
+            parameters += list(table_names)
+        return self._entries(conditions, parameters)
+
+    def film_run(self, title: str, distributor: str = None) -> pd.DataFrame:
+        conditions, parameters = ["f.title_key = ?"], [normalise_key(title)]
+        if distributor is not None:
+            conditions.append("d.name_key = ?")
+            parameters.append(normalise_key(distributor))
+        return self._entries(conditions, parameters)
+
+    def films_by_country(self, country: str, start=None, end=None) -> pd.DataFrame:
+        conditions, parameters = self._weekend_conditions(start, end)
+        conditions.append("e.film_id IN (SELECT film_id FROM film_countries WHERE country = ?)")
+        parameters.append(country)
+        return self._entries(conditions, parameters)
+
+    def films_by_distributor(self, distributor: str, start=None, end=None) -> pd.DataFrame:
+        conditions, parameters = self._weekend_conditions(start, end)
+        conditions.append("d.name_key = ?")
+        parameters.append(normalise_key(distributor))
+        return self._entries(conditions, parameters)
+
+    def openers(self, start=None, end=None) -> pd.DataFrame:
+        conditions, parameters = self._weekend_conditions(start, end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(f"""SELECT w.weekend_start AS "Weekend start", w.weekend_end AS "Weekend end",
+                                      o.film AS "Film", o.country_of_origin AS "Country of Origin",
+                                      o.distributor AS "Distributor"
+                               FROM openers o JOIN weekends w ON w.weekend_id = o.weekend_id
+                               {where} ORDER BY w.weekend_start, o.position""", parameters)
+
+    def notes(self, start=None, end=None) -> pd.DataFrame:
+        conditions, parameters = self._weekend_conditions(start, end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(f"""SELECT w.weekend_start AS "Weekend start", w.weekend_end AS "Weekend end",
+                                      n.film AS "Film", n.note AS "Notes"
+                               FROM notes n JOIN weekends w ON w.weekend_id = n.weekend_id
+                               {where} ORDER BY w.weekend_start, n.rowid""", parameters)
+
+    def comments(self, weekend_start: pd.Timestamp) -> list[str]:
+        return [comment for (comment,) in self.connection.execute(
+            "SELECT c.comment FROM comments c JOIN weekends w ON w.weekend_id = c.weekend_id \
+             WHERE w.weekend_start = ? ORDER BY c.position", (_date_text(weekend_start),))]
@@ -0,0 +1,128 @@
+import glob
+import logging
+import os
+import threading
+
+from utils.excel_parser import ExcelParser
+from utils.film_run_store import parse_report_weekend
+from utils.report_cache import ParsedReport, ReportCache
+from utils.report_views import ReportViews, DEFAULT_VIEW
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReportLibrary:
+    """
+        The reports a dashboard serves, keyed by weekend start date (YYYY-MM-DD).
+        Updates build a new mapping and swap it in with a single assignment, so callbacks reading
+        the library always see a complete set of reports, never one that is half updated.
+    """
+    def __init__(self):
+        self._reports = {} # weekend key -> ReportViews
+        self._paths = {} # source file path -> weekend key
+        self._lock = threading.Lock() # serialises writers; readers never need it
+
+    def add(self, excel_report_filepath: str, report) -> str:
+        weekend_start, _ = parse_report_weekend(report.report_heading)
+        key = f"{weekend_start:%Y-%m-%d}"
+        report_views = ReportViews(report)
+        report_views.view(DEFAULT_VIEW) # built up front, so the first user to select the report does not wait for it
+        with self._lock:
+            reports = dict(self._reports)
+            reports[key] = report_views
+            previous_key = self._paths.get(excel_report_filepath)
+            paths = {path: path_key for path, path_key in self._paths.items() if path != excel_report_filepath}
+            # the file may now hold another weekend, whose predecessor is dropped unless another file holds it
+            if previous_key is not None and previous_key != key and previous_key not in paths.values():
+                reports.pop(previous_key, None)
+            paths[excel_report_filepath] = key
+            self._paths = paths
+            self._reports = reports
+        return key
+
+    def remove_path(self, excel_report_filepath: str) -> None:
+        with self._lock:
+            key = self._paths.get(excel_report_filepath)
+            if key is None:
+                return
+            paths = {path: path_key for path, path_key in self._paths.items() if path != excel_report_filepath}
+            reports = dict(self._reports)
+            if key not in paths.values(): # unless another file holds the same weekend
+                reports.pop(key, None)
+            self._paths = paths
+            self._reports = reports
+
+    def keys(self) -> list[str]:
+        return sorted(self._reports, reverse=True)
+
+    def latest_key(self) -> str | None:
+        keys = self.keys()
+        return keys[0] if keys else None
+
+    def get(self, key: str, fallback_to_latest: bool = True) -> ReportViews | None:
+        """
+            Returns the views of the given weekend, or of the latest weekend if it is no longer served.
+            Without fallback_to_latest, returns None for a weekend that is not served.
+        """
+        reports = self._reports
+        if key in reports or not fallback_to_latest:
+            return reports.get(key)
+        latest_key = self.latest_key()
+        return reports.get(latest_key) if latest_key is not None else None
+
+    def options(self) -> list[dict]:
+        reports = self._reports
+        return [{"label": reports[key].report.report_heading, "value": key} for key in sorted(reports, reverse=True)]
+
+
+def load_report(excel_report_filepath: str, cache: ReportCache = None, instrumentation=None):
+    if cache is None:
+        return ParsedReport.from_excel_parser(ExcelParser(excel_report_filepath, instrumentation))
+    return cache.load(excel_report_filepath, instrumentation)
+
+
+class ReportDirectoryWatcher(threading.Thread):
+    """
+        Background worker that polls a directory for new, changed and removed xls reports
+        and keeps the report library in step with it.
+    """
+    def __init__(self, library: ReportLibrary, reports_dir: str, cache: ReportCache = None, poll_seconds: float = 30,
+                 instrumentation=None):
+        super().__init__(name="report-directory-watcher", daemon=True)
+        self.library = library
+        self.reports_dir = reports_dir
+        self.cache = cache
+        self.instrumentation = instrumentation # opt-in per-step metrics of the reports it parses
+        self.poll_seconds = poll_seconds
+        self._seen = {} # path -> (modification time, size)
+        self._stop_event = threading.Event()
+
+    def scan_once(self) -> None:
+        current = {}
+        for path in glob.glob(os.path.join(self.reports_dir, "*.xls")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue # removed between listing and stat
+            current[path] = (stat.st_mtime, stat.st_size)
+
+        for path, signature in sorted(current.items()):
+            if self._seen.get(path) == signature:
+                continue
+            try:
+                key = self.library.add(path, load_report(path, self.cache, self.instrumentation))
+                logger.info("Serving %s as weekend %s", path, key)
+            except Exception:
+                logger.exception("Could not load report %s; it will be retried when it changes.", path)
+        for path in set(self._seen) - set(current):
+            self.library.remove_path(path)
+            logger.info("Stopped serving %s", path)
+        self._seen = current
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.poll_seconds):
+            self.scan_once()
+
+    def stop(self) -> None:
+        self._stop_event.set()
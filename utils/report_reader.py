@@ -0,0 +1,196 @@
+import datetime
+from typing import Iterator, NamedTuple
+
+import xlrd
+
+from utils.notes_parser import parse_note
+from utils.sheet_scanner import (LayoutFingerprint, SheetScanner, COMMENT, DATA, NOTE, OPENERS, TOP_15_TABLE,
+                                 OTHER_UK_FILMS_TABLE, OTHER_NEW_RELEASES_TABLE, COMMENTS_SECTION, NOTES_SECTION,
+                                 OPENERS_SECTION)
+
+
+class FilmRecord(NamedTuple):
+    """A row of the top 15, other UK films or other new releases table."""
+    rank: int
+    film: str
+    country_of_origin: str
+    weekend_gross: int
+    distributor: str
+    change_on_last_week: float | None # None for new releases
+    weeks_on_release: int
+    number_of_cinemas: int
+    site_average: int
+    total_gross_to_date: int
+
+
+class NoteRecord(NamedTuple):
+    """A note on the top 15 table, with the fields parse_notes extracts from it."""
+    film: str
+    note: str
+    preview_gross: int | None
+    previews: int | None
+    fall_off_without_previews: float | None
+    preview_dates: tuple[datetime.date, ...]
+
+
+class OpenerRecord(NamedTuple):
+    """A row of the openers next week table."""
+    film: str
+    country_of_origin: str | None
+    distributor: str | None
+
+
+def _cell_value(cell):
+    # as SheetScanner._to_frame_value, but with None rather than NaN for empty cells
+    if cell == "" or cell is None:
+        return None
+    if isinstance(cell, float) and cell.is_integer():
+        return int(cell)
+    return cell
+
+
+def _percentage_value(cell) -> float | None:
+    # as pd.to_numeric(errors="coerce") on the '% change on last week' column
+    try:
+        return float(cell)
+    except (TypeError, ValueError):
+        return None
+
+
+def _preview_date(date: str) -> datetime.date | None:
+    try:
+        return datetime.datetime.strptime(date, "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+
+class ReportReader:
+    """
+        Lazy, record-by-record access to the sections of a report, for pipelines that need only some
+        of its sections and no DataFrames. The workbook is read with a single SheetScanner pass when a
+        section is first requested, and released straight after. The iter_ methods yield typed records
+        from the scanned grid; the properties of the same names build a section's records once, on first
+        access, and keep them. Unlike ExcelParser, it does not check the layout around each table.
+    """
+    def __init__(self, excel_report_filepath, layout_fingerprint: LayoutFingerprint = None):
+        self.excel_report_filepath = excel_report_filepath
+        self.layout_fingerprint = layout_fingerprint # learned from a previous report, tried before a full scan
+        self._sheet_scanner = None
+        self._sections = {}
+
+    @property
+    def sheet_scanner(self) -> SheetScanner:
+        if self._sheet_scanner is None:
+            try:
+                workbook = xlrd.open_workbook(self.excel_report_filepath, on_demand=True)
+            except NotImplementedError:
+                raise ValueError("This program is coded to run on xls files, not xlsx. Try downgrading the input file to xls first.")
+            try:
+                self._sheet_scanner = SheetScanner(workbook.sheet_by_index(0), fingerprint=self.layout_fingerprint)
+            finally:
+                workbook.release_resources() # every value needed is in the scanner's grid
+            if not self._sheet_scanner.fingerprint_matched:
+                self.layout_fingerprint = LayoutFingerprint.from_scanner(self._sheet_scanner)
+        return self._sheet_scanner
+
+    @property
+    def report_heading(self) -> str:
+        return self.sheet_scanner.cell_value(0, 0)
+
+    def _cells(self, section: str, kind: str) -> Iterator[tuple]:
+        grid = self.sheet_scanner.grid
+        for row_index in self.sheet_scanner.rows_of_kind(section, kind):
+            yield grid[row_index]
+
+    def _iter_films(self, section: str) -> Iterator[FilmRecord]:
+        for cells in self._cells(section, DATA):
+            values = [_cell_value(cell) for cell in cells]
+            values[5] = _percentage_value(cells[5])
+            yield FilmRecord(*values)
+
+    def iter_top_15(self) -> Iterator[FilmRecord]:
+        return self._iter_films(TOP_15_TABLE)
+
+    def iter_other_uk_films(self) -> Iterator[FilmRecord]:
+        return self._iter_films(OTHER_UK_FILMS_TABLE)
+
+    def iter_other_new_releases(self) -> Iterator[FilmRecord]:
+        return self._iter_films(OTHER_NEW_RELEASES_TABLE)
+
+    def iter_comments(self) -> Iterator[str]:
+        for cells in self._cells(COMMENTS_SECTION, COMMENT):
+            yield cells[1] # expects the value to be in column B
+
+    def iter_notes(self) -> Iterator[NoteRecord]:
+        """
+            Yields a record per note, in the order of the sheet; notes not in the 'Film (Distributor) - note'
+            layout are skipped, as parse_notes leaves them unmatched.
+        """
+        for cells in self._cells(NOTES_SECTION, NOTE):
+            parsed = parse_note(cells[1])
+            if parsed is None:
+                continue
+            preview_dates = tuple(date for date in map(_preview_date, parsed["dates"]) if date is not None)
+            yield NoteRecord(parsed["film"], parsed["note"], parsed["preview_gross"], parsed["previews"],
+                             parsed["fall_off"], preview_dates)
+
+    def iter_openers_next_week(self) -> Iterator[OpenerRecord]:
+        for cells in self._cells(OPENERS_SECTION, OPENERS):
+            yield OpenerRecord(_cell_value(cells[1]), _cell_value(cells[2]), _cell_value(cells[4]))
+
+    def _section(self, section: str, records: Iterator) -> tuple:
+        if section not in self._sections:
+            self._sections[section] = tuple(records)
+        return self._sections[section]
+
+    @property
+    def top_15(self) -> tuple[FilmRecord, ...]:
+        return self._section(TOP_15_TABLE, self.iter_top_15())
+
+    @property
+    def other_uk_films(self) -> tuple[FilmRecord, ...]:
+        return self._section(OTHER_UK_FILMS_TABLE, self.iter_other_uk_films())
+
+    @property
+    def other_new_releases(self) -> tuple[FilmRecord, ...]:
+        return self._section(OTHER_NEW_RELEASES_TABLE, self.iter_other_new_releases())
+
+    @property
+    def comments(self) -> tuple[str, ...]:
+        return self._section(COMMENTS_SECTION, self.iter_comments())
+
+    @property
+    def notes(self) -> tuple[NoteRecord, ...]:
+        return self._section(NOTES_SECTION, self.iter_notes())
+
+    @property
+    def openers_next_week(self) -> tuple[OpenerRecord, ...]:
+        return self._section(OPENERS_SECTION, self.iter_openers_next_week())
+
+
+# Section -> the ReportReader method that yields its records
+SECTION_ITERATORS = {
+    TOP_15_TABLE: ReportReader.iter_top_15,
+    OTHER_UK_FILMS_TABLE: ReportReader.iter_other_uk_films,
+    OTHER_NEW_RELEASES_TABLE: ReportReader.iter_other_new_releases,
+    COMMENTS_SECTION: ReportReader.iter_comments,
+    NOTES_SECTION: ReportReader.iter_notes,
+    OPENERS_SECTION: ReportReader.iter_openers_next_week,
+}
+
+
+def stream_records(excel_report_filepaths, section: str) -> Iterator[tuple[str, object]]:
+    """
+        Yields (report heading, record) for one section across many reports, e.g. section "openers_next_week".
+        Each report is scanned with the layout fingerprint of the previous one, and only one report's grid
+        is held at a time, so memory stays flat however many reports are streamed.
+    """
+    if section not in SECTION_ITERATORS:
+        raise ValueError(f"Unknown section '{section}'. Expected one of: {', '.join(SECTION_ITERATORS)}.")
+    layout_fingerprint = None
+    for excel_report_filepath in excel_report_filepaths:
+        reader = ReportReader(excel_report_filepath, layout_fingerprint)
+        report_heading = reader.report_heading
+        for record in SECTION_ITERATORS[section](reader):
+            yield report_heading, record
+        layout_fingerprint = reader.layout_fingerprint
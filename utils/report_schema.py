@@ -0,0 +1,99 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+
+# Repeated string columns, stored as categoricals
+CATEGORY_COLUMNS = ("Film", "Country of Origin", "Distributor")
+# Integer columns, downcast to the smallest integer dtype holding their values
+INTEGER_COLUMNS = ("Rank", "Weekend Gross", "Weeks on release", "Number of cinemas", "Site average", "Total Gross to date")
+COUNTRY_SEPARATOR = "/"
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        Returns a copy of a parsed table with its repeated string columns as categoricals and its integer
+        columns downcast. '% change on last week' stays float64, so exported percentages are not rounded
+        to float32 precision, e.g. -0.53 -> -0.5299999713897705.
+    """
+    typed = df.copy()
+    for column in CATEGORY_COLUMNS:
+        if column in typed.columns:
+            typed[column] = typed[column].astype("category")
+    for column in INTEGER_COLUMNS:
+        if column in typed.columns and pd.api.types.is_integer_dtype(typed[column]):
+            typed[column] = pd.to_numeric(typed[column], downcast="integer")
+    return typed
+
+
+def concat_typed(frames: list[pd.DataFrame], **concat_kwargs) -> pd.DataFrame:
+    """
+        pd.concat that keeps the categorical columns categorical, by giving every frame the union of their
+        categories first; pd.concat would otherwise fall back to object dtype when the categories differ.
+    """
+    frames = list(frames)
+    for column in CATEGORY_COLUMNS:
+        columns = [df[column] for df in frames if column in df.columns]
+        if len(columns) < 2 or not all(isinstance(series.dtype, pd.CategoricalDtype) for series in columns):
+            continue
+        categories = columns[0].cat.categories
+        for series in columns[1:]:
+            categories = categories.union(series.cat.categories)
+        frames = [df.assign(**{column: df[column].cat.set_categories(categories)}) if column in df.columns else df
+                  for df in frames]
+    return pd.concat(frames, **concat_kwargs)
+
+
+def _as_categorical(series: pd.Series) -> pd.Series:
+    return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+
+
+@functools.lru_cache(maxsize=64)
+def _category_countries(dtype: pd.CategoricalDtype) -> tuple[np.ndarray, pd.Index]:
+    """
+        Multi-hot boolean matrix of the countries of each category of a 'Country of Origin' dtype, with an
+        extra all-False last row, which the code -1 of missing values indexes, and the countries of its columns.
+        Cached per dtype, i.e. per set of categories, so the countries of a table are split once, not on every call.
+    """
+    categories = pd.Series(dtype.categories.astype(str))
+    per_category = categories.str.split(COUNTRY_SEPARATOR).explode().str.strip()
+    if per_category.empty:
+        per_category = pd.DataFrame(index=categories.index, columns=pd.Index([], dtype=object), dtype=bool)
+    else:
+        per_category = pd.crosstab(per_category.index, per_category).astype(bool).reindex(categories.index,
+                                                                                           fill_value=False)
+    lookup = np.vstack([per_category.to_numpy(dtype=bool), np.zeros((1, per_category.shape[1]), dtype=bool)])
+    lookup.flags.writeable = False # shared by every caller of the cache
+    return lookup, per_category.columns.rename(None)
+
+
+def country_matrix(country_of_origin: pd.Series) -> pd.DataFrame:
+    """
+        Multi-hot boolean matrix of a 'Country of Origin' column, with one column per country,
+        e.g. 'UK/USA' -> True under both UK and USA. The countries are split once per set of categories
+        rather than once per row, and missing values have no country.
+    """
+    categorical = _as_categorical(country_of_origin)
+    lookup, countries = _category_countries(categorical.dtype)
+    matrix = lookup[categorical.cat.codes.to_numpy()]
+    # slices of a larger table keep all of its categories, so only the countries present are kept
+    present = matrix.any(axis=0)
+    return pd.DataFrame(matrix[:, present], index=country_of_origin.index, columns=countries[present])
+
+
+def country_mask(country_of_origin: pd.Series, country: str, case: bool = True) -> pd.Series:
+    """
+        Whether each 'Country of Origin' entry lists the given country, e.g. 'UK' matches 'UK/USA'.
+        A lookup of the entries' category codes in the cached countries of their categories.
+    """
+    categorical = _as_categorical(country_of_origin)
+    lookup, countries = _category_countries(categorical.dtype)
+    if case:
+        selected = countries.to_numpy() == country
+    else:
+        selected = np.asarray(countries.str.upper() == str(country).upper(), dtype=bool)
+    if not selected.any():
+        return pd.Series(False, index=country_of_origin.index)
+    category_listed = lookup[:, selected].any(axis=1)
+    return pd.Series(category_listed[categorical.cat.codes.to_numpy()], index=country_of_origin.index)
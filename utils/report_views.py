@@ -0,0 +1,150 @@
+import pandas as pd
+from dash import dash_table, dcc, html
+
+from utils.dash_styling import (create_paragraphs_from_list_of_comments, produce_dash_table_with_common_styling,
+																server_side_table_properties)
+from utils.data_preparation import DataPreparation
+from utils.excel_parser import ExcelParser
+from utils.report_schema import concat_typed
+from utils.table_queries import query_table_page
+
+
+VIEW_OPTIONS = [
+		{"label": "Top 15 Highest Grossing Films", "value": "top-15"},
+		{"label": "UK Films in the Top 15", "value": "uk-in-top-15"},
+		{"label": "New Releases in the Top 15", "value": "new-releases-in-top-15"},
+		{"label": "All UK Films", "value": "all-uk-films"},
+		{"label": "All New Releases", "value": "all-new-releases"},
+		{"label": "Openers Next Week", "value": "openers-next-week"}
+]
+VIEW_TITLES = {option["value"]: option["label"] for option in VIEW_OPTIONS}
+VIEW_TITLES["top-15"] = "Top 15 Highest-Grossing Films"
+DEFAULT_VIEW = "top-15"
+TABLE_ID_TYPE = "dataset-table" # pattern-matching id type shared by every view's table
+
+
+class ReportViews:
+	"""
+		Builds the dataset and Dash view behind each dropdown option of a report only when it is first
+		requested, and memoises both so that each is built at most once per report.
+	"""
+	def __init__(self, report, data_preparer: DataPreparation = None):
+		self.report = report # an ExcelParser or a cached ParsedReport
+		self.data_preparer = data_preparer if data_preparer is not None else DataPreparation()
+		self._raw_datasets = {}
+		self._datasets = {}
+		self._views = {}
+		# unformatted datasets, which paging, sorting and filtering are done against
+		self._raw_dataset_builders = {
+			"top-15": lambda: self.report.top_15_df_with_notes_column,
+			"uk-in-top-15": lambda: ExcelParser.filter_for_UK_films(self.raw_dataset("top-15")),
+			"new-releases-in-top-15": lambda: ExcelParser.filter_for_new_releases(self.raw_dataset("top-15")),
+			"all-uk-films": lambda: concat_typed([self.raw_dataset("uk-in-top-15"), self.report.other_uk_films_df],
+																					 ignore_index=True),
+			"all-new-releases": lambda: concat_typed([self.raw_dataset("new-releases-in-top-15"),
+																						self.report.other_new_releases_df], ignore_index=True),
+			"openers-next-week": lambda: self.report.openers_next_week_df,
+		}
+
+	def raw_dataset(self, dataset_id: str) -> pd.DataFrame:
+		if dataset_id not in self._raw_datasets:
+			self._raw_datasets[dataset_id] = self._raw_dataset_builders[dataset_id]()
+		return self._raw_datasets[dataset_id]
+
+	def dataset(self, dataset_id: str) -> pd.DataFrame:
+		if dataset_id not in self._datasets:
+			self._datasets[dataset_id] = self.data_preparer.restore_original_formatting(self.raw_dataset(dataset_id))
+		return self._datasets[dataset_id]
+
+	def table_page(self, view_id: str, page_current: int, page_size: int,
+								 sort_by: list[dict] = None, filter_query: str = "") -> tuple[list[dict], int]:
+		"""
+			Returns the formatted records of one page of the view's table, after filtering and sorting
+			the unformatted dataset, along with the number of pages.
+		"""
+		page_df, page_count = query_table_page(self.raw_dataset(view_id), page_current, page_size, sort_by, filter_query,
+																					 self.data_preparer.percentage_value_columns)
+		return self.data_preparer.restore_original_formatting(page_df).to_dict("records"), page_count
+
+	def _numeric_columns(self, view_id: str) -> list[str]:
+		df = self.raw_dataset(view_id)
+		return [column for column in df.columns if pd.api.types.is_numeric_dtype(df[column])
+						or column in self.data_preparer.gbp_value_columns + self.data_preparer.percentage_value_columns]
+
+	def _produce_table(self, view_id: str):
+		return produce_dash_table_with_common_styling(self.raw_dataset(view_id),
+																									table_id={"type": TABLE_ID_TYPE, "index": view_id},
+																									numeric_columns=self._numeric_columns(view_id))
+
+	def view(self, view_id: str) -> html.Div:
+		if view_id not in VIEW_TITLES:
+			raise ValueError(f"Unknown view '{view_id}'. Expected one of: {', '.join(VIEW_TITLES)}.")
+		if view_id not in self._views:
+			if view_id == "top-15":
+				self._views[view_id] = self._build_top_15_view()
+			elif view_id == "openers-next-week":
+				self._views[view_id] = self._build_openers_next_week_view()
+			else:
+				self._views[view_id] = html.Div(id=view_id, children=[
+						html.H2(VIEW_TITLES[view_id]),
+						self._produce_table(view_id)
+				])
+		return self._views[view_id]
+
+	def _build_top_15_view(self) -> html.Div:
+		total_weekend_gross_of_top_15 = self.data_preparer.format_gbp_currency(self.report.total_top_15_weekend_gross)
+		total_gross_to_date_of_top_15 = self.data_preparer.format_gbp_currency(self.report.total_top_15_gross_to_date)
+
+		return html.Div(id="top-15", children=[
+				html.H2(VIEW_TITLES["top-15"]),
+
+				dcc.Markdown("""
+						*Note: 'Weekend Gross' figures will include Previews where applicable. See Notes column for more details.*
+					"""
+					),
+
+				self._produce_table("top-15"),
+
+				html.Div(id="revenue-totals", children=[
+						html.P(f"Top 15 Total Weekend Gross: {total_weekend_gross_of_top_15}", style={"fontWeight": "bold"}),
+						html.P(f"Total 15 Total Gross To Date: {total_gross_to_date_of_top_15}", style={"fontWeight": "bold"})
+				], style={"marginTop": "20px"}
+				),
+
+				html.Div(id="comments", children=[
+						html.H3("""
+								Comments on this week's top 15 results
+						"""),
+
+						html.Div(create_paragraphs_from_list_of_comments(self.report.list_of_comments_on_top_15_result)),
+				]),
+		])
+
+	def _build_openers_next_week_view(self) -> html.Div:
+		return html.Div(id="openers-next-week", children=[
+				html.H2(VIEW_TITLES["openers-next-week"]),
+				dash_table.DataTable(**server_side_table_properties({"type": TABLE_ID_TYPE, "index": "openers-next-week"}),
+														columns=[{"name": col, "id": col, "type": "text"}
+																		 for col in self.raw_dataset("openers-next-week").columns],
+														style_table={
+															"width": "auto",
+															"minWidth": "50%",
+															"maxWidth": "75%",
+														},
+														style_header={
+															"whitespace": "nowrap",
+															"textAlign": "left"
+														},
+														style_cell={
+														"minWidth": "50px",
+														"width": "auto",
+														"maxWidth": "200px",
+														"whiteSpace": "normal",
+														"paddingLeft": "8px",
+														"paddingRight": "8px"
+														},
+														style_data={
+															"textAlign": "left"
+														},
+														fixed_rows={"headers": True},)
+		], style={"width": "100%"})
@@ -0,0 +1,201 @@
+from collections import defaultdict
+
+import pandas as pd
+
+
+# Row classifications assigned during the scan
+HEADING = "heading"
+HEADER = "header"
+DATA = "data"
+TOTAL = "total"
+FOOTNOTE = "footnote"
+BLANK = "blank"
+COMMENT = "comment"
+NOTE = "note"
+OPENERS = "openers"
+OTHER = "other"
+
+# Sections of the report, in the order they appear on the sheet
+TOP_15_TABLE = "top_15"
+OTHER_UK_FILMS_TABLE = "other_uk_films"
+OTHER_NEW_RELEASES_TABLE = "other_new_releases"
+COMMENTS_SECTION = "comments"
+NOTES_SECTION = "notes"
+OPENERS_SECTION = "openers_next_week"
+
+SECTION_MARKERS = (
+    (OTHER_UK_FILMS_TABLE, "Other UK films"),
+    (OTHER_NEW_RELEASES_TABLE, "Other new releases"),
+    (COMMENTS_SECTION, "Comments on this week's top 15 results"),
+    (NOTES_SECTION, "Notes for Top 15 table:"),
+    (OPENERS_SECTION, "Openers next week:"),
+)
+
+TABLE_SECTIONS = (TOP_15_TABLE, OTHER_UK_FILMS_TABLE, OTHER_NEW_RELEASES_TABLE)
+
+
+class LayoutMismatch(Exception):
+    pass
+
+
+class LayoutFingerprint:
+    """
+        Column positions learned from one scanned report: the column each section marker is in, and a column
+        that is filled in on most non-blank rows. Scanning a similar report with it checks a single cell
+        per row for the next marker instead of searching the whole row, and tells most non-blank rows apart
+        from blank ones by a single cell too.
+    """
+    def __init__(self, marker_columns: dict[str, int], content_column: int):
+        self.marker_columns = marker_columns
+        self.content_column = content_column
+
+    @classmethod
+    def from_scanner(cls, sheet_scanner: "SheetScanner") -> "LayoutFingerprint | None":
+        """
+            Returns the fingerprint of a scanned sheet, or None if the sheet is missing any section marker.
+        """
+        marker_columns = {}
+        for section, marker in SECTION_MARKERS:
+            if section not in sheet_scanner.anchors:
+                return None
+            anchor_cells = sheet_scanner.grid[sheet_scanner.anchors[section]]
+            if marker not in anchor_cells: # beyond the table width
+                return None
+            marker_columns[section] = anchor_cells.index(marker)
+        # the section markers sit in the column the film titles, comments and notes are in;
+        # any column is safe to test first, since a filled cell always means a non-blank row
+        marker_column_values = list(marker_columns.values())
+        return cls(marker_columns, max(set(marker_column_values), key=marker_column_values.count))
+
+
+class SheetScanner:
+    """
+        Reads an xlrd sheet once into an in-memory grid, classifying every row in the same sweep
+        so that all datasets of the report can be sliced from the grid without re-reading the sheet.
+        Given the layout fingerprint of a similar report, the sweep first trusts its column positions,
+        and falls back to a full sweep if any section marker is not where the fingerprint expects it.
+    """
+    def __init__(self, excel_sheet, table_width: int = 10, fingerprint: LayoutFingerprint = None):
+        self.table_width = table_width
+        self.nrows = excel_sheet.nrows
+        self.fingerprint_matched = False
+        if fingerprint is not None:
+            try:
+                self._scan(excel_sheet, fingerprint)
+                self.fingerprint_matched = True
+                return
+            except LayoutMismatch:
+                pass
+        self._scan(excel_sheet)
+
+    def _reset(self) -> None:
+        self.grid = []
+        self.row_kinds = []
+        self.row_sections = []
+        self.anchors = {}
+        self.table_ends = {}
+        self.section_rows = defaultdict(list)
+
+    @staticmethod
+    def _is_blank_row(row: list, content_column: int = None) -> bool:
+        if content_column is not None and content_column < len(row) and row[content_column] not in ("", None):
+            return False
+        return all(cell == "" or cell is None for cell in row)
+
+    @staticmethod
+    def _is_marker_row(row: list, marker_index: int, fingerprint: LayoutFingerprint = None) -> bool:
+        section, marker = SECTION_MARKERS[marker_index]
+        if fingerprint is None:
+            return marker in row
+        marker_column = fingerprint.marker_columns[section]
+        return marker_column < len(row) and row[marker_column] == marker
+
+    def _scan(self, excel_sheet, fingerprint: LayoutFingerprint = None) -> None:
+        self._reset()
+        content_column = fingerprint.content_column if fingerprint is not None else None
+        next_marker_index = 0
+        section = None
+        table_open = False
+
+        for row_index in range(self.nrows):
+            row = excel_sheet.row_values(row_index)
+            is_blank = self._is_blank_row(row, content_column)
+            cells = tuple(row[:self.table_width])
+            if len(cells) < self.table_width:
+                cells += ("",) * (self.table_width - len(cells))
+
+            if next_marker_index < len(SECTION_MARKERS) and self._is_marker_row(row, next_marker_index, fingerprint):
+                section = SECTION_MARKERS[next_marker_index][0]
+                next_marker_index += 1
+                self.anchors[section] = row_index
+                table_open = section in TABLE_SECTIONS
+                kind = HEADER
+            elif row_index == 0:
+                kind = HEADING
+            elif row_index == 1:
+                section = TOP_15_TABLE
+                self.anchors[section] = row_index
+                table_open = True
+                kind = HEADER
+            elif is_blank:
+                if table_open:
+                    self.table_ends[section] = row_index
+                    table_open = False
+                kind = BLANK
+            else:
+                kind = self._classify_content_row(section, table_open, cells)
+
+            self.grid.append(cells)
+            self.row_kinds.append(kind)
+            self.row_sections.append(section)
+            self.section_rows[(section, kind)].append(row_index)
+
+        if fingerprint is not None and next_marker_index < len(SECTION_MARKERS):
+            # the marker may be in another column than the fingerprint's, so only a full sweep can tell
+            raise LayoutMismatch(f"'{SECTION_MARKERS[next_marker_index][1]}' not found in the fingerprinted column.")
+
+    @staticmethod
+    def _classify_content_row(section, table_open: bool, cells: tuple) -> str:
+        if section == TOP_15_TABLE:
+            if cells[1] == "Total":
+                return TOTAL
+            if isinstance(cells[1], str) and cells[1].startswith("Note:"):
+                return FOOTNOTE
+            return DATA
+        if section in TABLE_SECTIONS:
+            return DATA if table_open else OTHER
+        if section == COMMENTS_SECTION:
+            return COMMENT
+        if section == NOTES_SECTION:
+            return NOTE
+        if section == OPENERS_SECTION:
+            return OPENERS
+        return OTHER
+
+    def is_blank(self, row_index: int) -> bool:
+        return self.row_kinds[row_index] == BLANK
+
+    def rows_of_kind(self, section: str, kind: str) -> list[int]:
+        return self.section_rows.get((section, kind), [])
+
+    def cell_value(self, row_index: int, col_index: int):
+        return self.grid[row_index][col_index]
+
+    @staticmethod
+    def _to_frame_value(cell):
+        # mirrors the cell conversion applied by pd.read_excel on xls files
+        if cell == "" or cell is None:
+            return float("nan")
+        if isinstance(cell, float) and cell.is_integer():
+            return int(cell)
+        return cell
+
+    def read_table(self, row_indices, column_names: list, usecols=None) -> pd.DataFrame:
+        if usecols is None:
+            usecols = range(self.table_width)
+        records = [[self._to_frame_value(self.grid[row_index][col_index]) for col_index in usecols]
+                   for row_index in row_indices]
+        df = pd.DataFrame.from_records(records, columns=list(range(len(usecols))))
+        df = df.infer_objects()
+        df.columns = column_names
+        return df
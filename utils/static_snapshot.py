@@ -0,0 +1,259 @@
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from dash.development.base_component import Component
+
+from utils.film_run_store import parse_report_weekend
+from utils.report_cache import ReportCache, hash_report_file
+from utils.report_library import load_report
+from utils.report_views import ReportViews, VIEW_OPTIONS, VIEW_TITLES, DEFAULT_VIEW
+
+
+SNAPSHOT_VERSION = "1" # bump whenever a change to the rendering alters the pages or data written
+MANIFEST_FILENAME = "manifest.json"
+INDEX_FILENAME = "index.html"
+MARKDOWN_EMPHASIS_PATTERN = re.compile(r"\*([^*]+)\*")
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 20px; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #d3d3d3; padding: 4px 8px; vertical-align: top; }}
+th {{ background: #f5f5f5; }}
+nav a {{ margin-right: 12px; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def _style_attribute(style: dict) -> str:
+    # React style keys are camelCase, e.g. fontWeight -> font-weight
+    declarations = [f"{re.sub(r'([A-Z])', lambda match: '-' + match.group(1).lower(), key)}: {value}"
+                    for key, value in style.items()]
+    return f' style="{html.escape("; ".join(declarations))}"'
+
+
+def _render_markdown(text: str) -> str:
+    # the views only use Markdown for short emphasised notes, so paragraphs and *emphasis* are enough
+    paragraphs = [" ".join(line.strip() for line in block.splitlines()).strip()
+                  for block in re.split(r"\n\s*\n", text)]
+    return "".join("<p>" + MARKDOWN_EMPHASIS_PATTERN.sub(r"<em>\1</em>", html.escape(paragraph)) + "</p>"
+                   for paragraph in paragraphs if paragraph)
+
+
+def _render_table(columns: list[str], records: list[dict]) -> str:
+    header = "".join(f"<th>{html.escape(column)}</th>" for column in columns)
+    rows = "".join("<tr>" + "".join(f"<td>{'' if record[column] is None else html.escape(str(record[column]))}</td>"
+                                    for column in columns) + "</tr>"
+                   for record in records)
+    return f"<table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>"
+
+
+def render_component(component, table_records: list[dict]) -> str:
+    """
+        Renders a Dash view as static HTML. The view's DataTable is server-paged, so it holds no rows;
+        it is rendered from the view's full formatted dataset instead.
+    """
+    if component is None:
+        return ""
+    if isinstance(component, (list, tuple)):
+        return "".join(render_component(child, table_records) for child in component)
+    if not isinstance(component, Component):
+        return html.escape(str(component))
+
+    props = component.to_plotly_json()["props"]
+    if component._namespace == "dash_table":
+        return _render_table([column["id"] for column in props["columns"]], table_records)
+    if component._type == "Markdown":
+        children = props.get("children", "")
+        return _render_markdown(children if isinstance(children, str) else "\n\n".join(children))
+    tag = component._type.lower()
+    attributes = f' id="{html.escape(str(props["id"]))}"' if isinstance(props.get("id"), str) else ""
+    if props.get("style"):
+        attributes += _style_attribute(props["style"])
+    children = props.get("children")
+    if isinstance(children, str):
+        children = children.strip()
+    return f"<{tag}{attributes}>{render_component(children, table_records)}</{tag}>"
+
+
+def _weekend_key(report_heading: str) -> str:
+    weekend_start, _ = parse_report_weekend(report_heading)
+    return f"{weekend_start:%Y-%m-%d}"
+
+
+def _source_signature(excel_report_filepath: str) -> list:
+    stat = os.stat(excel_report_filepath)
+    return [stat.st_mtime, stat.st_size]
+
+
+def _write_text(path: str, text: str) -> None:
+    # written to a temporary file and renamed, so a sync to static hosting never picks up a half-written file
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temporary_path, path)
+
+
+def _navigation(report_heading: str, current_view: str) -> str:
+    links = [f'<a href="../{INDEX_FILENAME}">All weekends</a>']
+    for option in VIEW_OPTIONS:
+        label = html.escape(option["label"])
+        links.append(f"<strong>{label}</strong>" if option["value"] == current_view
+                     else f'<a href="{option["value"]}.html">{label}</a>')
+    return f"<h1>{html.escape(report_heading)}</h1><nav>{''.join(links)}</nav>"
+
+
+def write_report_snapshot(report_views: ReportViews, weekend_dir: str) -> None:
+    """
+        Writes each of the report's views to weekend_dir as a static page, <view>.html, alongside the view's
+        full formatted table as json, <view>.json, in the {"columns": [...], "data": [records]} layout
+        of a Dash DataTable.
+    """
+    report_heading = report_views.report.report_heading
+    for option in VIEW_OPTIONS:
+        view_id = option["value"]
+        dataset = report_views.dataset(view_id)
+        # pandas serialises the records directly, with missing values as null
+        table_json = f'{{"columns": {json.dumps(list(dataset.columns))}, "data": {dataset.to_json(orient="records")}}}'
+        _write_text(os.path.join(weekend_dir, f"{view_id}.json"), table_json)
+        body = _navigation(report_heading, view_id) + \
+            render_component(report_views.view(view_id), json.loads(table_json)["data"]) + \
+            f'<p><a href="{view_id}.json">Table data (json)</a></p>'
+        _write_text(os.path.join(weekend_dir, f"{view_id}.html"),
+                    PAGE_TEMPLATE.format(title=html.escape(f"{report_heading} - {VIEW_TITLES[view_id]}"), body=body))
+
+
+class SnapshotBuildResult:
+    def __init__(self, built: list[str], unchanged: list[str], removed: list[str], failures: dict[str, str]):
+        self.built = built # weekend keys
+        self.unchanged = unchanged
+        self.removed = removed
+        self.failures = failures # source path -> error message
+
+    def summary(self) -> str:
+        lines = [f"Built {len(self.built)} weekends, kept {len(self.unchanged)} unchanged, removed {len(self.removed)}."]
+        if self.failures:
+            lines.append(f"{len(self.failures)} reports failed to build:")
+            lines.extend(f"  {path}: {error}" for path, error in self.failures.items())
+        return "\n".join(lines)
+
+
+class StaticSnapshotBuilder:
+    """
+        Builds a static copy of the dashboard that can be served without a Python process: an index of every
+        weekend, and for each weekend a directory of its six views as html with their table data as json.
+        Each weekend's directory is named after its weekend and a hash of its source file, the parser
+        version and the snapshot version, so its files never change under the same URL and can be cached
+        indefinitely; only index.html and manifest.json are rewritten by each build. Rebuilds only
+        render the weekends whose source file has changed, and drop those whose source is gone.
+    """
+    def __init__(self, output_dir: str, cache: ReportCache = None):
+        self.output_dir = output_dir
+        self.cache = cache
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+
+    def load_manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {"snapshot_version": SNAPSHOT_VERSION, "weekends": {}}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("snapshot_version") != SNAPSHOT_VERSION:
+            manifest["weekends"] = {} # rendered by another version, so every weekend is rebuilt
+        return manifest
+
+    @staticmethod
+    def _build_digest(source_hash: str) -> str:
+        return hashlib.sha256(f"{source_hash}:snapshot-v{SNAPSHOT_VERSION}".encode()).hexdigest()[:12]
+
+    def _build_weekend(self, excel_report_filepath: str, source_hash: str, force: bool = False) -> tuple[str, dict]:
+        report = load_report(excel_report_filepath, self.cache)
+        key = _weekend_key(report.report_heading)
+        weekend_dir_name = f"{key}-{self._build_digest(source_hash)}"
+        weekend_dir = os.path.join(self.output_dir, weekend_dir_name)
+        if force or not os.path.isdir(weekend_dir):
+            # rendered into a temporary directory and renamed, so a weekend directory is always complete
+            staging_dir = tempfile.mkdtemp(prefix=f".{key}-", dir=self.output_dir)
+            try:
+                write_report_snapshot(ReportViews(report), staging_dir)
+                os.chmod(staging_dir, 0o755)
+                if os.path.isdir(weekend_dir):
+                    shutil.rmtree(weekend_dir)
+                os.replace(staging_dir, weekend_dir)
+            except BaseException:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise
+        return key, {
+            "heading": report.report_heading,
+            "source": excel_report_filepath,
+            "source_signature": _source_signature(excel_report_filepath),
+            "source_hash": source_hash,
+            "directory": weekend_dir_name,
+        }
+
+    def build(self, report_paths: list[str], force: bool = False) -> SnapshotBuildResult:
+        """
+            Brings the snapshot in line with the given reports. With force, every weekend is rendered again.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        previous_weekends = self.load_manifest()["weekends"]
+        # source path -> (weekend key, manifest entry) of its last build
+        previous_by_source = {entry["source"]: (key, entry) for key, entry in previous_weekends.items()}
+        weekends, built, unchanged, failures = {}, [], [], {}
+
+        for excel_report_filepath in report_paths:
+            previous_key, previous_entry = previous_by_source.get(excel_report_filepath, (None, None))
+            try:
+                signature = _source_signature(excel_report_filepath)
+                source_hash = None
+                if not force and previous_entry is not None and \
+                        previous_entry["directory"].endswith(self._build_digest(previous_entry["source_hash"])) and \
+                        os.path.isdir(os.path.join(self.output_dir, previous_entry["directory"])):
+                    if previous_entry["source_signature"] != signature:
+                        source_hash = hash_report_file(excel_report_filepath)
+                    if source_hash is None or source_hash == previous_entry["source_hash"]:
+                        # the source may only have been touched, so its signature is refreshed
+                        weekends[previous_key] = dict(previous_entry, source_signature=signature)
+                        unchanged.append(previous_key)
+                        continue
+                key, entry = self._build_weekend(excel_report_filepath, source_hash or hash_report_file(excel_report_filepath),
+                                                 force)
+                weekends[key] = entry
+                built.append(key)
+            except Exception as error:
+                failures[excel_report_filepath] = f"{type(error).__name__}: {error}"
+                if previous_entry is not None: # the last good build stays up until the source is fixed
+                    weekends.setdefault(previous_key, previous_entry)
+
+        self._write_index(weekends)
+        _write_text(self.manifest_path, json.dumps({"snapshot_version": SNAPSHOT_VERSION,
+                                                    "weekends": dict(sorted(weekends.items()))}, indent=2))
+
+        # directories no longer listed are removed only once the new index and manifest are in place
+        live_directories = {entry["directory"] for entry in weekends.values()}
+        removed = sorted(key for key in previous_weekends if key not in weekends)
+        for name in os.listdir(self.output_dir):
+            path = os.path.join(self.output_dir, name)
+            if os.path.isdir(path) and name not in live_directories and re.match(r"\d{4}-\d{2}-\d{2}-[0-9a-f]{12}$", name):
+                shutil.rmtree(path)
+        return SnapshotBuildResult(built, unchanged, removed, failures)
+
+    def _write_index(self, weekends: dict) -> None:
+        items = "".join(f'<li><a href="{entry["directory"]}/{DEFAULT_VIEW}.html">{html.escape(entry["heading"])}</a></li>'
+                        for key, entry in sorted(weekends.items(), reverse=True))
+        body = f"<h1>BFI Weekend Box Office Reports</h1><ul>{items}</ul>"
+        _write_text(os.path.join(self.output_dir, INDEX_FILENAME),
+                    PAGE_TEMPLATE.format(title="BFI Weekend Box Office Reports", body=body))
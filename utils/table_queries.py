@@ -0,0 +1,121 @@
+import math
+import re
+
+import pandas as pd
+
+from utils.report_schema import country_mask
+
+
+# DataTable filter_query relational operators, normalised to a single name each
+FILTER_OPERATORS = {
+    ">=": "ge", "ge": "ge", "s>=": "ge", "i>=": "ge",
+    "<=": "le", "le": "le", "s<=": "le", "i<=": "le",
+    ">": "gt", "gt": "gt", "s>": "gt", "i>": "gt",
+    "<": "lt", "lt": "lt", "s<": "lt", "i<": "lt",
+    "!=": "ne", "ne": "ne", "s!=": "ne", "i!=": "ne",
+    "=": "eq", "eq": "eq", "s=": "eq", "i=": "eq",
+    "contains": "contains", "scontains": "contains", "icontains": "contains",
+    "datestartswith": "datestartswith",
+}
+FILTER_PART_PATTERN = re.compile(
+    r"^\s*\{(?P<column>[^}]+)\}\s*(?P<operator>"
+    + "|".join(re.escape(operator) for operator in sorted(FILTER_OPERATORS, key=len, reverse=True))
+    + r")\s*(?P<value>.*?)\s*$"
+)
+# columns holding '/'-separated lists, e.g. 'UK/USA', where '=' matches any one of the entries
+MULTI_VALUE_COLUMNS = {"Country of Origin": country_mask}
+
+
+def split_filter_part(filter_part: str) -> tuple:
+    """
+        Splits one clause of a DataTable filter_query, e.g. "{Weekend Gross} >= 10000",
+        into (column, operator, value). Returns (None, None, None) if the clause is not understood.
+    """
+    match = FILTER_PART_PATTERN.match(filter_part)
+    if not match:
+        return None, None, None
+    value = match.group("value")
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"', "`"):
+        value = value[1:-1].replace("\\" + value[0], value[0])
+    else:
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    return match.group("column"), FILTER_OPERATORS[match.group("operator")], value
+
+
+def _filter_mask(series: pd.Series, operator: str, value, percentage_columns=()) -> pd.Series:
+    if operator == "contains":
+        return series.astype(str).str.contains(str(value), case=False, regex=False, na=False)
+    if operator == "datestartswith":
+        return series.astype(str).str.startswith(str(value), na=False)
+
+    if series.name in MULTI_VALUE_COLUMNS and operator in ("eq", "ne"):
+        mask = MULTI_VALUE_COLUMNS[series.name](series, str(value), case=False)
+        return mask if operator == "eq" else ~mask
+
+    # stored as fractions but shown as percentages, e.g. -0.53 shown as '-53%', so filters are typed in percent
+    if series.name in percentage_columns:
+        if isinstance(value, str) and value.endswith("%"):
+            try:
+                value = float(value[:-1])
+            except ValueError:
+                pass
+        if isinstance(value, float):
+            value = value / 100
+
+    if isinstance(value, float):
+        series = pd.to_numeric(series, errors="coerce")
+    else:
+        series = series.astype(str)
+        value = str(value)
+    if operator == "eq":
+        return series == value
+    if operator == "ne":
+        return series != value
+    if operator == "gt":
+        return series > value
+    if operator == "ge":
+        return series >= value
+    if operator == "lt":
+        return series < value
+    return series <= value
+
+
+def apply_filter_query(df: pd.DataFrame, filter_query: str, percentage_columns=()) -> pd.DataFrame:
+    if not filter_query:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for filter_part in filter_query.split(" && "):
+        column, operator, value = split_filter_part(filter_part)
+        if column is None or column not in df.columns:
+            continue
+        mask &= _filter_mask(df[column], operator, value, percentage_columns)
+    return df[mask]
+
+
+def apply_sort(df: pd.DataFrame, sort_by: list[dict]) -> pd.DataFrame:
+    if not sort_by:
+        return df
+    sort_by = [sort for sort in sort_by if sort["column_id"] in df.columns]
+    return df.sort_values(
+        [sort["column_id"] for sort in sort_by],
+        ascending=[sort["direction"] == "asc" for sort in sort_by],
+        kind="stable",
+        na_position="last",
+    )
+
+
+def query_table_page(df: pd.DataFrame, page_current: int, page_size: int,
+                     sort_by: list[dict] = None, filter_query: str = "",
+                     percentage_columns: list[str] = ()) -> tuple[pd.DataFrame, int]:
+    """
+        Filters and sorts the table, then returns only the requested page along with the page count.
+        Filters on percentage_columns, which hold fractions shown as percentages, are read in percent.
+    """
+    queried_df = apply_sort(apply_filter_query(df, filter_query, percentage_columns), sort_by)
+    page_count = max(1, math.ceil(len(queried_df) / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    start = page_current * page_size
+    return queried_df.iloc[start:start + page_size], page_count